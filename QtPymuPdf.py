@@ -1,11 +1,24 @@
+import os
+import re
+import bisect
 import pymupdf
 from PyQt6 import QtCore
 from PyQt6 import QtGui
 from PyQt6 import QtWidgets
 from PyQt6.QtCore import pyqtSignal as Signal, pyqtSlot as Slot
-from dataclasses import dataclass, InitVar
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from enum import Enum
 from math import sqrt
+from multiprocessing import get_context
+from time import monotonic
+from typing import Callable
+
+from cache import LRUCache
+from keywords import KeywordMatcher, KeywordResults, KeywordSignals, KeywordWorker
+from library import Library, LibrarySignals, LibrarySearchWorker
+from links import LinkSignals, LinkStore, LinkWorker, LabelWorker, LinkGraph, LinkGraphWorker, NamedDestinations, NamedDestinationsWorker
+from search import SearchSignals, SearchWorker, SnippetWorker, SearchIndex, SearchQuery, SearchHits, PageWords, IndexWorker, openIndex
 
 
 class ZoomSelector(QtWidgets.QComboBox):
@@ -79,6 +92,60 @@ class ZoomSelector(QtWidgets.QComboBox):
             self.zoomFactorChanged.emit(factor)
 
 
+class Prefetcher:
+    """
+        Guess the pages to be visited next from the navigation direction and speed
+
+        More pages are expected ahead the faster the user flips pages, fewer behind.
+        The pages returned fit within max_bytes according to the cost function given to pages().
+    """
+    def __init__(self, ahead: int = 2, behind: int = 1, max_ahead: int = 8, max_bytes: int = 64 * 1024 * 1024):
+        self.ahead = ahead
+        self.behind = behind
+        self.max_ahead = max_ahead
+        self.max_bytes = max_bytes
+        self.lookahead = 1.0  # seconds of navigation at the current speed to prefetch
+
+        self.direction: int = 1
+        self._history: deque[tuple[float, int]] = deque(maxlen=8)  # (time, pno)
+
+    def track(self, pno: int):
+        if self._history and pno != self._history[-1][1]:
+            self.direction = 1 if pno > self._history[-1][1] else -1
+        self._history.append((monotonic(), pno))
+
+    def reset(self):
+        self.direction = 1
+        self._history.clear()
+
+    def speed(self) -> float:
+        """Return the navigation speed in pages per second over the last two seconds"""
+        now = monotonic()
+        recent = [(t, pno) for t, pno in self._history if now - t < 2.0]
+        if len(recent) < 2:
+            return 0.0
+        pages = sum(abs(b[1] - a[1]) for a, b in zip(recent, recent[1:]))
+        return pages / max(now - recent[0][0], 0.1)
+
+    def pages(self, pno: int, page_count: int, cost: Callable[[int], int] | None = None) -> list[int]:
+        """Return the pages to prefetch around pno, most likely first"""
+        ahead = min(self.max_ahead, self.ahead + round(self.speed() * self.lookahead))
+        forward = [pno + self.direction * i for i in range(1, ahead + 1)]
+        backward = [pno - self.direction * i for i in range(1, self.behind + 1)]
+
+        candidates = forward[:1] + backward[:1] + forward[1:] + backward[1:]
+        pages = []
+        total = 0
+        for candidate in candidates:
+            if not 0 <= candidate < page_count:
+                continue
+            total += cost(candidate) if cost is not None else 0
+            if total > self.max_bytes:
+                break
+            pages.append(candidate)
+        return pages
+
+
 class PageNavigator(QtWidgets.QWidget):
     currentPnoChanged = Signal(int)
     currentLocationChanged = Signal(QtCore.QPointF)
@@ -89,6 +156,8 @@ class PageNavigator(QtWidgets.QWidget):
         self._current_page_label: str = ""
         self._current_location: QtCore.QPointF = QtCore.QPointF()
         self._page_index:  dict[str, int] = {}
+        self._page_labels: list[str] = []
+        self._prefetcher = Prefetcher()
 
         if parent is not None:
             parent = parent.toolbar()
@@ -126,16 +195,23 @@ class PageNavigator(QtWidgets.QWidget):
 
     def setDocument(self, document: pymupdf.Document):
         self._document: pymupdf.Document = document
+        self._prefetcher.reset()
         self.indexPages()
 
     def indexPages(self):
+        self._page_index.clear()
+        self._page_labels.clear()
         page: pymupdf.Page
         for page in self._document:
             self._page_index.update({page.get_label() : page.number})
+            self._page_labels.append(page.get_label())
     
     def pageNumberFromLabel(self, label) -> int | None:
         return self._page_index.get(label)
 
+    def pageLabel(self, pno: int) -> str:
+        return self._page_labels[pno] or f"{pno + 1}"
+
     def updatePageLineEdit(self):
         page_label = self.currentPageLabel()
 
@@ -154,17 +230,21 @@ class PageNavigator(QtWidgets.QWidget):
 
         if 0<= index < self._document.page_count:
             self._current_pno = index
+            self._prefetcher.track(index)
             self.updatePageLineEdit()
 
             if old_index != self._current_pno:
                 self.currentPnoChanged.emit(self._current_pno)
 
     def currentPageLabel(self) -> str:
-        page: pymupdf.Page = self._document[self.currentPno()]
-        return page.get_label()
+        # labels are indexed once: the document may be in use by the render worker
+        return self._page_labels[self.currentPno()]
 
     def currentPno(self) -> int:
         return self._current_pno
+
+    def prefetcher(self) -> Prefetcher:
+        return self._prefetcher
     
     def jump(self, page: int, location = QtCore.QPointF()):
         self.setCurrentPno(page)
@@ -223,6 +303,7 @@ class OutlineItem(QtGui.QStandardItem):
 class OutlineModel(QtGui.QStandardItemModel):
     def __init__(self, parent=None):
         super().__init__(parent)
+        self._named_destinations: NamedDestinations | None = None
 
     def setupModelData(self, outline: list[list]):    
         parents: list[OutlineItem] = []
@@ -248,168 +329,837 @@ class OutlineModel(QtGui.QStandardItemModel):
 
     def setDocument(self, doc: pymupdf.Document):
         self._document = doc
+        self._named_destinations = None
         self.setupModelData(self.getToc())
 
+    def setNamedDestinations(self, destinations: NamedDestinations | None):
+        self._named_destinations = destinations
+
+    def destination(self, item: OutlineItem) -> tuple[int, pymupdf.Point | None]:
+        """Return the target page and point of item; entries with a named destination are looked up in the named destinations"""
+        details = getattr(item, "details", None) or {}
+        if details.get("kind") == pymupdf.LINK_NAMED and self._named_destinations is not None:
+            destination = self._named_destinations.resolve(details.get("nameddest", ""))
+            if destination is not None:
+                return destination[0], destination[1]
+        return item.page, None
+
     def getToc(self):
         toc = self._document.get_toc(simple=False)
         return toc
 
-@dataclass
-class GoToLink:
-    kind: Kind = Kind.LINK_GOTO
-    xref: int = 0
-    hotspot: pymupdf.Rect = None
-    page_to: int = 0
-    to: pymupdf.Point = None
-    zoom: float = 1.0
-    id: str = ""
-    page: InitVar[pymupdf.Page | None] = None
-    page_from: int = 0
-    label: str = ""
-
-    def __post_init__(self, page: pymupdf.Page):
-        self.page_from = page.number
-        height_correction = self.hotspot.height * 0.1
-        rect = self.hotspot + [0, height_correction, 0, -height_correction]
-        label: str = page.get_textbox(rect)
-        self.label = label.strip().replace("\n", " ")
+class LinkView:
+    """A link of a LinkStore: reads the store columns, holds nothing else"""
+    __slots__ = ("store", "i")
+    kind: Kind = Kind.LINK_NONE
 
-@dataclass
-class UriLink:
-    kind: Kind = Kind.LINK_URI
-    xref: int = 0
-    hotspot: pymupdf.Rect = None
-    uri: str = ""
-    id: str = ""
-    page: InitVar[pymupdf.Page | None] = None
-    page_from: int = 0
-    label: str = ""
-
-    def __post_init__(self, page: pymupdf.Page):
-        self.page_from = page.number
-        height_correction = self.hotspot.height * 0.1
-        rect = self.hotspot + [0, height_correction, 0, -height_correction]
-        label: str = page.get_textbox(rect)
-        self.label = label.strip().replace("\n", " ")
+    def __init__(self, store: LinkStore, i: int):
+        self.store = store
+        self.i = i
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, LinkView) and self.store is other.store and self.i == other.i
+
+    def __hash__(self) -> int:
+        return hash((id(self.store), self.i))
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}(page_from={self.page_from}, hotspot={self.hotspot}, label={self.label!r})"
+
+    @property
+    def xref(self) -> int:
+        return self.store.xrefs[self.i]
 
-@dataclass
-class NamedLink:
-    kind: Kind = Kind.LINK_NAMED
-    xref: int = 0
-    hotspot: pymupdf.Rect = None
-    page_to: int = 0
-    to: pymupdf.Point = None
-    zoom: float = 1.0
-    nameddest: str = ""
-    id: str = ""
-    page: InitVar[pymupdf.Page | None] = None
-    page_from: int = 0
-    label: str = ""
-
-    def __post_init__(self, page: pymupdf.Page):
-        self.page_from = page.number
-        height_correction = - self.hotspot.height * 0.1
-        rect = self.hotspot + [0, height_correction, 0, -height_correction]
-        label: str = page.get_textbox(rect)
+    @property
+    def hotspot(self) -> pymupdf.Rect:
+        return self.store.hotspot(self.i)
+
+    @property
+    def page_from(self) -> int:
+        return self.store.pages_from[self.i]
+
+    @property
+    def label(self) -> str | None:
+        """None until resolved"""
+        return self.store.labels.get(self.i)
+
+    @label.setter
+    def label(self, label: str):
+        self.store.labels[self.i] = label
+
+    def labelRect(self) -> pymupdf.Rect:
+        hotspot = self.hotspot
+        height_correction = hotspot.height * 0.1
+        return hotspot + [0, height_correction, 0, -height_correction]
+
+    def resolveLabel(self, page: pymupdf.Page | None, words: PageWords | None = None) -> str:
+        """Read the label from the page, or from its words if given"""
+        label: str = page.get_textbox(self.labelRect()) if words is None else words.textIn(self.labelRect())
         self.label = label.strip().replace("\n", " ")
+        return self.label
+
+    def readLabel(self, words: PageWords) -> str:
+        """Return the label read from the page words, without keeping it: may be called off the GUI thread"""
+        return words.textIn(self.labelRect()).strip().replace("\n", " ")
+
+class GoToLink(LinkView):
+    __slots__ = ()
+    kind = Kind.LINK_GOTO
+
+    @property
+    def page_to(self) -> int:
+        return self.store.pages_to[self.i]
+
+    @property
+    def to(self) -> pymupdf.Point | None:
+        return self.store.target(self.i)
+
+    @property
+    def zoom(self) -> float:
+        return self.store.zooms[self.i]
+
+class UriLink(LinkView):
+    __slots__ = ()
+    kind = Kind.LINK_URI
+
+    @property
+    def uri(self) -> str:
+        return self.store.name(self.i)
+
+class NamedLink(LinkView):
+    __slots__ = ()
+    kind = Kind.LINK_NAMED
+    page_to = GoToLink.page_to
+    to = GoToLink.to
+    zoom = GoToLink.zoom
+
+    @property
+    def nameddest(self) -> str:
+        return self.store.name(self.i)
+
+    def labelRect(self) -> pymupdf.Rect:
+        hotspot = self.hotspot
+        height_correction = - hotspot.height * 0.1
+        return hotspot + [0, height_correction, 0, -height_correction]
 
 class LinkFactory:
     def __init__(self):
-        self.link_types = {}
+        self.link_types: dict[int, type[LinkView]] = {}
 
         link_type: GoToLink | UriLink | NamedLink
         for link_type in [GoToLink, UriLink, NamedLink]:
-            self.link_types[link_type.kind] = link_type
-
-    def createLink(self, link: dict, page: pymupdf.Page):
-        val: GoToLink | UriLink | NamedLink
-        # val = self.link_types.get(link['kind'])
-        for key, val in self.link_types.items():
-            if link['kind'] == key.value:
-                return val(*link.values(), page)
+            self.link_types[link_type.kind.value] = link_type
+
+    def createLink(self, store: LinkStore, i: int) -> GoToLink | UriLink | NamedLink | None:
+        """Return the view of link i of store, unlabelled; None for other kinds of links"""
+        link_type = self.link_types.get(store.kinds[i])
+        if link_type is None:
+            return None
+        return link_type(store, i)
+
+    def pageLinks(self, store: LinkStore, pno: int) -> list:
+        links = (self.createLink(store, i) for i in store.pageLinks(pno))
+        return [link for link in links if link is not None]
+
+    def readLabels(self, links: list, words: PageWords) -> dict[int, str]:
+        """Return the labels of the unlabelled links of a page, {link: label}, in one pass over the spatial index of its words"""
+        return {link.i: link.readLabel(words) for link in links if link.label is None}
             
 class LinkItem(QtGui.QStandardItem):
     def __init__(self, link: GoToLink | UriLink | NamedLink):
         super().__init__()
         self._link = link
-
-        self.setData(self._link.label, role=QtCore.Qt.ItemDataRole.DisplayRole)
+        self.setEditable(False)
+
+    def data(self, role: int = QtCore.Qt.ItemDataRole.UserRole + 1):
+        if role == QtCore.Qt.ItemDataRole.DisplayRole:
+            # the label is only read from the page when the row is first shown, in background
+            if self._link.label is None:
+                if self.model() is not None:
+                    self.model().requestLabel(self._link)
+                return "…"
+            return self._link.label
+        return super().data(role)
     
     def link(self):
         return self._link
 
 class LinkModel(QtGui.QStandardItemModel):
+    """
+        Links of the document, extracted page by page in background and labelled in background when displayed
+
+        The named destinations are loaded from the sidecar, or resolved, before the links are listed. The link graph
+        between pages (see LinkGraph) is loaded from the sidecar, or built from the links as they are listed.
+    """
+    sigLinkGraphChanged = Signal()
+    sigNamedDestinationsChanged = Signal()
+
     def __init__(self, parent=None):
         super().__init__(parent)
 
+        self._document: pymupdf.Document | None = None
+        self._link_factory = LinkFactory()
+        self._links = LinkStore()
+        self._items: dict[int, LinkItem] = {}  # link: item
+        self._words_cache = LRUCache(max_entries=32)
+        self._index: SearchIndex | None = None
+        self._link_graph: LinkGraph | None = None
+        self._graph_builder: LinkGraph | None = None  # graph not in the sidecar, built from the links listed
+        self._named_destinations: NamedDestinations | None = None
+
+        self._link_pool = QtCore.QThreadPool(self)
+        self._link_pool.setMaxThreadCount(1)
+        self._link_signals = LinkSignals(self)
+        self._link_signals.pagesLinked.connect(self.onPagesLinked)
+        self._link_signals.graphBuilt.connect(self.onGraphBuilt)
+        self._link_signals.namesResolved.connect(self.onNamesResolved)
+        self._link_signals.labelsRead.connect(self.onLabelsRead)
+        self._link_signals.finished.connect(self.onLinksListed)
+        self._link_ticket: int = 0
+
+        # Labels are read from the page words by a LabelWorker, for the pages of the rows displayed
+        self._label_pool = QtCore.QThreadPool(self)
+        self._label_pool.setMaxThreadCount(1)
+        self._label_requests: set[int] = set()  # pages of rows displayed unlabelled, read by the next LabelWorker
+        self._label_pending: set[int] = set()  # pages being read
+
     def setDocument(self, doc: pymupdf.Document):
+        self._link_ticket += 1
+        self._link_pool.clear()
+        self._label_pool.clear()
+        self._link_pool.waitForDone()
+        self._label_pool.waitForDone()
+        self.clear()
+        self._links = LinkStore()
+        self._items.clear()
+        self._label_requests.clear()
+        self._label_pending.clear()
+        self._words_cache.clear()
+        self._link_graph = None
+        self._graph_builder = None
+        self._named_destinations = None
+        self.sigLinkGraphChanged.emit()
+        self.sigNamedDestinationsChanged.emit()
         self._document = doc
+        self._index = openIndex(doc.name)
         self.setupModelData()
 
-    def setupModelData(self):    
-        parent = self.invisibleRootItem()
+    def isCancelled(self, ticket: int) -> bool:
+        return ticket != self._link_ticket
+
+    def setupModelData(self):
+        self._link_pool.start(NamedDestinationsWorker(self._document, self._link_ticket, self.isCancelled, self._link_signals))
+        self._link_pool.start(LinkGraphWorker(self._document, self._link_ticket, self.isCancelled, self._link_signals))
+        self._link_pool.start(LinkWorker(self._document, [pymupdf.LINK_GOTO, pymupdf.LINK_NAMED],
+                                         self._link_ticket, self.isCancelled, self._link_signals))
+
+    @Slot(int, object)
+    def onPagesLinked(self, ticket: int, links: LinkStore):
+        if self.isCancelled(ticket):
+            return
+        if self._named_destinations is not None:
+            links.resolveNames(self._named_destinations)
+        if self._graph_builder is not None:
+            self._graph_builder.addLinks(links, self._document.page_count)
+        start = len(self._links)
+        self._links.extend(links)
+        link_views = (self._link_factory.createLink(self._links, i) for i in range(start, len(self._links)))
+        items = [LinkItem(link) for link in link_views if link is not None]
+        self._items.update((item.link().i, item) for item in items)
+        self.invisibleRootItem().appendRows(items)
+
+    @Slot(int, object)
+    def onGraphBuilt(self, ticket: int, graph: LinkGraph | None):
+        if self.isCancelled(ticket):
+            return
+        if graph is None:
+            self._graph_builder = LinkGraph()
+            return
+        self._link_graph = graph
+        self.sigLinkGraphChanged.emit()
+
+    @Slot(int)
+    def onLinksListed(self, ticket: int):
+        if self.isCancelled(ticket) or self._graph_builder is None:
+            return
+        self._link_graph, self._graph_builder = self._graph_builder, None
+        self.sigLinkGraphChanged.emit()
+        self._link_pool.start(LinkGraphWorker(self._document, self._link_ticket, self.isCancelled, self._link_signals,
+                                              self._link_graph))
+
+    @Slot(int, object)
+    def onNamesResolved(self, ticket: int, destinations: NamedDestinations):
+        if self.isCancelled(ticket):
+            return
+        self._named_destinations = destinations
+        self._links.resolveNames(destinations)
+        self.sigNamedDestinationsChanged.emit()
+
+    def namedDestinations(self) -> NamedDestinations | None:
+        """Return the named destinations of the document, None until resolved"""
+        return self._named_destinations
+
+    def linkGraph(self) -> LinkGraph | None:
+        """Return the link graph between pages, None until built"""
+        return self._link_graph
+
+    def requestLabel(self, link: GoToLink | UriLink | NamedLink):
+        """Have link labelled in background, with the other links of its page"""
+        pno = link.page_from
+        if pno in self._label_pending or pno in self._label_requests:
+            return
+        if not self._label_requests:
+            # rows painted together are labelled by one worker
+            QtCore.QTimer.singleShot(0, self.readLabels)
+        self._label_requests.add(pno)
+
+    def readLabels(self):
+        pages = sorted(self._label_requests)
+        self._label_requests.clear()
+        if not pages:
+            return
+        self._label_pending.update(pages)
+        self._label_pool.start(LabelWorker(self._document, pages, self.pageLabels, self._link_ticket, self.isCancelled,
+                                           self._link_signals, self._index, self._words_cache))
+
+    def pageLabels(self, pno: int, words: PageWords) -> dict[int, str]:
+        """Return the labels of the unlabelled links of page pno: called by the LabelWorker"""
+        return self._link_factory.readLabels(self._link_factory.pageLinks(self._links, pno), words)
+
+    @Slot(int, list, dict)
+    def onLabelsRead(self, ticket: int, pages: list, labels: dict):
+        if self.isCancelled(ticket):
+            return
+        for pno in pages:
+            self._label_pending.discard(pno)
+            for i in self._links.pageLinks(pno):
+                self._links.labels.setdefault(i, labels.get(i, ""))  # not read: not requested again
+                item = self._items.get(i)
+                if item is not None:
+                    item.emitDataChanged()
+
+
+class SearchModel(QtCore.QAbstractListModel):
+    """
+        Search hits, one row per hit
 
-        link_factory = LinkFactory()
+        Hits are kept in compact arrays (SearchHits). Rows are handed to the views by batches of fetch_size
+        as they scroll (canFetchMore/fetchMore). The context snippet of a row is extracted in background
+        once the row is displayed, the row is updated when it is ready.
+    """
+    sigTextFound = Signal(str)
+    sigHitsChanged = Signal(list)  # pages whose hits were added or removed
 
-        for page in self._document:
-            for link in page.links([pymupdf.LINK_GOTO, pymupdf.LINK_NAMED]):
-                link_object = link_factory.createLink(link, page)
+    def __init__(self, parent=None):
+        super().__init__(parent)
 
-                link_item = LinkItem(link_object)
-                parent.appendRow(link_item)
+        self._hits = SearchHits()
+        self.fetch_size = 256
+        self._rows = 0  # hits fetched by the views
+        self._fetch_target = self.fetch_size  # hits asked for by the views, fetched as they are found
+        self._snippets = LRUCache(max_entries=1024)  # hit: text around
+        self._snippet_requests: set[int] = set()  # hits displayed without snippet, extracted by the next SnippetWorker
+        self._snippet_pending: set[int] = set()  # hits being extracted
+        self._snippet_pool = QtCore.QThreadPool(self)
+        self._snippet_pool.setMaxThreadCount(1)
+
+        self._searching = False
+        self._searched_pages = 0
+        self._error = ""
+
+        # Last query, and whether its search was complete: a query narrowing it only re-checks the pages found
+        self._query: SearchQuery | None = None
+        self._query_complete = False
+
+        # Search runs in a worker filling the model page by page; a new search cancels the one in flight
+        self._search_pool = QtCore.QThreadPool(self)
+        self._search_pool.setMaxThreadCount(1)
+        self._search_signals = SearchSignals(self)
+        self._search_signals.pageFound.connect(self.onPageFound)
+        self._search_signals.progress.connect(self.onSearchProgress)
+        self._search_signals.finished.connect(self.onSearchFinished)
+        self._search_signals.failed.connect(self.onSearchFailed)
+        self._search_signals.executorBroken.connect(self.onExecutorBroken)
+        self._search_signals.snippetsFound.connect(self.onSnippetsFound)
+        self._search_ticket: int = 0
+
+        # Documents with many pages not indexed yet are searched by a pool of processes, 0 to disable
+        self.process_search_pages: int = 200
+        self._search_executor: ProcessPoolExecutor | None = None
+
+        # Page words matched by regex, whole word, case-sensitive and multi-term queries
+        self._words_cache = LRUCache(max_bytes=64 * 1024 * 1024)
+
+        # Full-text index stored in the document sidecar, built once in background
+        self._index: SearchIndex | None = None
+        self._index_pool = QtCore.QThreadPool(self)
+        self._index_pool.setMaxThreadCount(1)
+        self._index_ticket: int = 0
 
+    def setDocument(self, doc: pymupdf.Document):
+        self.cancelSearch()
+        self._index_ticket += 1
+        self._search_pool.waitForDone()
+        self._snippet_pool.waitForDone()
+        self._index_pool.waitForDone()
+        self._document = doc
+        self._words_cache.clear()
+        self._query = None
+        self.clearHits()
+
+        self._index = openIndex(doc.name)
+        if self._index is not None:
+            self._index_pool.start(IndexWorker(doc, self._index, self._index_ticket, self.isIndexCancelled))
+
+    def isIndexCancelled(self, ticket: int) -> bool:
+        return ticket != self._index_ticket
+
+    def cancelSearch(self):
+        self._search_ticket += 1
+        self._search_pool.clear()
+        self._searching = False
+
+    def isCancelled(self, ticket: int) -> bool:
+        return ticket != self._search_ticket
+
+    def searchExecutor(self) -> ProcessPoolExecutor | None:
+        """Return the search process pool if the document is large enough and can be opened by other processes"""
+        if (self.process_search_pages <= 0 or self._document.page_count < self.process_search_pages
+                or not os.path.isfile(self._document.name)):
+            return None
+        if self._search_executor is None:
+            # spawn: forking a process running Qt threads is unsafe; processes start with the first search
+            self._search_executor = ProcessPoolExecutor(mp_context=get_context("spawn"))
+        return self._search_executor
+
+    def shutdown(self):
+        """Cancel the search and stop the search processes"""
+        self._search_ticket += 1
+        if self._search_executor is not None:
+            self._search_executor.shutdown(wait=False, cancel_futures=True)
+            self._search_executor = None
+
+    def searchFor(self, text: str, case_sensitive: bool = False, whole_word: bool = False, regex: bool = False):
+        """
+            Search text; terms separated by "|" are searched at once, or text is a regular expression if regex
+            The search in flight is cancelled. When the previous search completed and the query extends it,
+            only the pages already found are searched again.
+        """
+        query = SearchQuery(text, case_sensitive, whole_word, regex)
+        if query == self._query and (self._searching or self._query_complete):
+            return
+
+        pages = None
+        if self._query is not None and self._query_complete and query.narrows(self._query):
+            pages = set(self._hits)
+
+        self.cancelSearch()
+        self.clearHits()
+        self._searched_pages = 0
+        self._error = ""
+        self._query = query
+        self._query_complete = False
+
+        if query.terms():
+            try:
+                worker = SearchWorker(self._document, query, self._search_ticket, self.isCancelled, self._search_signals, self._index,
+                                      self.searchExecutor(), self.process_search_pages, words_cache=self._words_cache, pages=pages)
+            except re.error as e:
+                self._error = f"Invalid expression: {e}"
+            else:
+                self._searching = True
+                self._search_pool.start(worker)
+
+        self.sigTextFound.emit(self.hitsText())
+
+    def clearHits(self):
+        pages = list(self._hits)
+        self.beginResetModel()
+        self._hits.clear()
+        self._rows = 0
+        self._fetch_target = self.fetch_size
+        self._snippets.clear()
+        self._snippet_requests.clear()
+        self._snippet_pending.clear()
+        self.endResetModel()
+        if pages:
+            self.sigHitsChanged.emit(pages)
+
+    @Slot(int, int, str, list)
+    def onPageFound(self, ticket: int, pno: int, label: str, quads: list):
+        if self.isCancelled(ticket):
+            return
+
+        self._hits.addPage(pno, label, quads)
+        self.fetchRows()
+
+        self.sigHitsChanged.emit([pno])
+        self.sigTextFound.emit(self.hitsText())
+
+    def rowCount(self, parent=QtCore.QModelIndex()) -> int:
+        return 0 if parent.isValid() else self._rows
+
+    def canFetchMore(self, parent: QtCore.QModelIndex) -> bool:
+        return not parent.isValid() and self._rows < self._hits.count()
+
+    def fetchMore(self, parent: QtCore.QModelIndex):
+        if parent.isValid():
+            return
+        self._fetch_target = self._rows + self.fetch_size
+        self.fetchRows()
+
+    def fetchTo(self, row: int):
+        """Fetch the hits up to row, if found"""
+        if row >= self._rows:
+            self._fetch_target = max(self._fetch_target, row + 1)
+            self.fetchRows()
+
+    def fetchRows(self):
+        """Insert the hits found up to the number asked for by the views"""
+        count = min(self._fetch_target, self._hits.count()) - self._rows
+        if count <= 0:
+            return
+        self.beginInsertRows(QtCore.QModelIndex(), self._rows, self._rows + count - 1)
+        self._rows += count
+        self.endInsertRows()
+
+    def data(self, index: QtCore.QModelIndex, role: int = QtCore.Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or index.row() >= self._rows:
+            return None
+
+        pno = self._hits.pnos[index.row()]
+        if role == QtCore.Qt.ItemDataRole.DisplayRole:
+            return f"p. {self._hits.labels[pno] or pno + 1}\t{self.snippet(index.row())}"
+        if role == QtCore.Qt.ItemDataRole.ToolTipRole:
+            return f"index: {pno}\tlabel: {self._hits.labels[pno]}"
+        return None
+
+    def snippet(self, hit: int) -> str:
+        """Return the text around hit, "…" until extracted in background"""
+        snippet = self._snippets.get(hit)
+        if snippet is None:
+            self.requestSnippet(hit)
+            return "…"
+        return snippet
+
+    def requestSnippet(self, hit: int):
+        if hit in self._snippet_pending or hit in self._snippet_requests:
+            return
+        if not self._snippet_requests:
+            # rows painted together are extracted by one worker
+            QtCore.QTimer.singleShot(0, self.extractSnippets)
+        self._snippet_requests.add(hit)
+
+    def extractSnippets(self):
+        hits = sorted(self._snippet_requests)
+        self._snippet_requests.clear()
+        if not hits:
+            return
+        self._snippet_pending.update(hits)
+        requests = [(hit, self._hits.pnos[hit], self._hits.quad(hit).rect) for hit in hits]
+        self._snippet_pool.start(SnippetWorker(self._document, requests, self._search_ticket, self.isCancelled,
+                                               self._search_signals, self._index, self._words_cache))
+
+    @Slot(int, dict)
+    def onSnippetsFound(self, ticket: int, snippets: dict):
+        if self.isCancelled(ticket):
+            return
+        for hit, snippet in snippets.items():
+            self._snippets.insert(hit, snippet)
+            self._snippet_pending.discard(hit)
+        rows = [hit for hit in snippets if hit < self._rows]
+        if rows:
+            self.dataChanged.emit(self.index(min(rows), 0), self.index(max(rows), 0), [QtCore.Qt.ItemDataRole.DisplayRole])
+
+    def hitFrom(self, pno: int) -> int:
+        """Return the row of the first hit on page pno or after"""
+        return bisect.bisect_left(self._hits.pnos, pno)
+
+    def hit(self, row: int) -> tuple[int, pymupdf.Quad, str]:
+        """Return the page, quad and page label of hit row"""
+        pno = self._hits.pnos[row]
+        return pno, self._hits.quad(row), self._hits.labels[pno]
+
+    @Slot(int, int)
+    def onSearchProgress(self, ticket: int, searched_pages: int):
+        if self.isCancelled(ticket):
+            return
+        self._searched_pages = searched_pages
+        self.sigTextFound.emit(self.hitsText())
+
+    @Slot(int)
+    def onSearchFinished(self, ticket: int):
+        if self.isCancelled(ticket):
+            return
+        self._searching = False
+        self._query_complete = not self._error
+        self.sigTextFound.emit(self.hitsText())
+
+    @Slot(int, str)
+    def onSearchFailed(self, ticket: int, error: str):
+        if self.isCancelled(ticket):
+            return
+        self._error = error
+
+    @Slot(object)
+    def onExecutorBroken(self, executor: ProcessPoolExecutor):
+        """Drop the process pool once one of its processes died: the next search starts another one"""
+        if executor is not self._search_executor:
+            return
+        executor.shutdown(wait=False, cancel_futures=True)
+        self._search_executor = None
+
+    def isSearching(self) -> bool:
+        return self._searching
+
+    def hitsText(self) -> str:
+        if self._error:
+            return self._error
+        if self._searching:
+            return f"Hits: {self._hits.count()} ({self._searched_pages}/{self._document.page_count} pages)"
+        return f"Hits: {self._hits.count()}"
 
-class SearchItem(QtGui.QStandardItem):
-    def __init__(self, result: dict):
-        super().__init__()
+    def foundCount(self):
+        return self._hits.count()
+    
+    def getSearchResults(self) -> SearchHits:
+        """Return the hits, read as a mapping pno: quads"""
+        return self._hits
 
-        self.pno = result['pno']
-        self.quads = result['quads']
-        self.page_label = result['label']
+    def document(self) -> pymupdf.Document:
+        return self._document
 
-        self.setData(f"index: {self.pno}\tlabel: {self.page_label}", role=QtCore.Qt.ItemDataRole.DisplayRole)
-    
-    def results(self):
-        return self.pno, self.quads, self.page_label
+    def searchIndex(self) -> SearchIndex | None:
+        return self._index
 
+    def wordsCache(self) -> LRUCache:
+        return self._words_cache
 
-class SearchModel(QtGui.QStandardItemModel):
-    sigTextFound = Signal(str)
 
-    def __init__(self, parent=None):
+class KeywordItem(QtGui.QStandardItem):
+    """A term of a keyword list, or a page holding it (pno is None for the term)"""
+    def __init__(self, term: int, pno: int | None = None, text: str = ""):
+        super().__init__()
+
+        self.term = term
+        self.pno = pno
+        self.setData(text, role=QtCore.Qt.ItemDataRole.DisplayRole)
+        self.setEditable(False)
+
+
+class KeywordModel(QtGui.QStandardItemModel):
+    """
+        Batch search of a keyword list: each page is scanned once for all the terms (KeywordMatcher)
+        Hits are grouped by term, then page. The index and page words cache are those of search_model.
+    """
+    sigStatusChanged = Signal(str)
+
+    def __init__(self, search_model: SearchModel, parent=None):
         super().__init__(parent)
 
-        self._search_results: dict[int, list] = {}
+        self._search_model = search_model
+        self._document: pymupdf.Document | None = None
+        self._results = KeywordResults([])
+        self._searching = False
+        self._scanned_pages = 0
+
+        self._search_pool = QtCore.QThreadPool(self)
+        self._search_pool.setMaxThreadCount(1)
+        self._search_signals = KeywordSignals(self)
+        self._search_signals.pageScanned.connect(self.onPageScanned)
+        self._search_signals.progress.connect(self.onSearchProgress)
+        self._search_signals.finished.connect(self.onSearchFinished)
+        self._search_ticket: int = 0
 
     def setDocument(self, doc: pymupdf.Document):
+        """Drop the scan and results of the previous document"""
+        self.cancelSearch()
+        self._search_pool.waitForDone()
+        self.clear()
         self._document = doc
+        self._results = KeywordResults([])
+        self._scanned_pages = 0
+        self.sigStatusChanged.emit(self.statusText())
+
+    def cancelSearch(self):
+        self._search_ticket += 1
+        self._search_pool.clear()
+        self._searching = False
+
+    def isCancelled(self, ticket: int) -> bool:
+        return ticket != self._search_ticket
 
-    def searchFor(self, text: str):
+    def searchKeywords(self, terms: list[str], case_sensitive: bool = False, whole_word: bool = False):
+        self.cancelSearch()
+        self._search_pool.waitForDone()
         self.clear()
-        self._search_results.clear()
-        
+
+        terms = list(dict.fromkeys(term.strip() for term in terms if term.strip()))
+        self._results = KeywordResults(terms)
+        self._scanned_pages = 0
+        for i, term in enumerate(terms):
+            self.invisibleRootItem().appendRow(KeywordItem(i, text=f"{term}\thits: 0"))
+
+        if terms and self._document is not None:
+            self._searching = True
+            matcher = KeywordMatcher(terms, case_sensitive, whole_word)
+            self._search_pool.start(KeywordWorker(self._document, matcher, self._search_ticket, self.isCancelled,
+                                                  self._search_signals, self._search_model.searchIndex(), self._search_model.wordsCache()))
+
+        self.sigStatusChanged.emit(self.statusText())
+
+    @Slot(int, int, str, dict)
+    def onPageScanned(self, ticket: int, pno: int, label: str, page_hits: dict):
+        if self.isCancelled(ticket):
+            return
+
+        self._results.addPage(pno, label, page_hits)
+        for i, quads in page_hits.items():
+            term_item: KeywordItem = self.item(i)
+            term_item.appendRow(KeywordItem(i, pno, f"index: {pno}\tlabel: {label}\thits: {len(quads)}"))
+            term_item.setData(f"{self._results.terms[i]}\thits: {self._results.count(i)}", role=QtCore.Qt.ItemDataRole.DisplayRole)
+
+        self.sigStatusChanged.emit(self.statusText())
+
+    @Slot(int, int)
+    def onSearchProgress(self, ticket: int, scanned_pages: int):
+        if self.isCancelled(ticket):
+            return
+        self._scanned_pages = scanned_pages
+        self.sigStatusChanged.emit(self.statusText())
+
+    @Slot(int)
+    def onSearchFinished(self, ticket: int):
+        if self.isCancelled(ticket):
+            return
+        self._searching = False
+        self.sigStatusChanged.emit(self.statusText())
+
+    def isSearching(self) -> bool:
+        return self._searching
+
+    def results(self) -> KeywordResults:
+        return self._results
+
+    def termHits(self, term: int) -> dict[int, list]:
+        """Return the hits of term: pno: quads"""
+        return self._results.hits[term]
+
+    def statusText(self) -> str:
+        terms = self._results.terms
+        found = sum(1 for hits in self._results.hits if hits)
+        text = f"Terms found: {found}/{len(terms)}\tHits: {sum(self._results.count(i) for i in range(len(terms)))}"
+        if self._searching:
+            text += f" ({self._scanned_pages}/{self._document.page_count} pages)"
+        return text
+
+
+class LibraryItem(QtGui.QStandardItem):
+    """A file of the library holding hits, or one of its pages (pno is None for the file)"""
+    def __init__(self, filename: str, pno: int | None = None, page_label: str = "", hits: int = 0):
+        super().__init__()
+
+        self.filename = filename
+        self.pno = pno
+        self.page_label = page_label
+        self.hits = hits
+
+        if pno is None:
+            self.setData(f"{os.path.basename(filename)}\thits: {hits}", role=QtCore.Qt.ItemDataRole.DisplayRole)
+            self.setData(filename, role=QtCore.Qt.ItemDataRole.ToolTipRole)
+        else:
+            self.setData(f"index: {pno}\tlabel: {page_label}\thits: {hits}", role=QtCore.Qt.ItemDataRole.DisplayRole)
+
+    def results(self):
+        return self.filename, self.pno, self.page_label
+
+
+class LibraryModel(QtGui.QStandardItemModel):
+    """Hits of a search over the library files, grouped by file then page"""
+    sigStatusChanged = Signal(str)
+
+    def __init__(self, library: Library, parent=None):
+        super().__init__(parent)
+
+        self._library = library
+        self._library.sigChanged.connect(self.onLibraryChanged)
+
+        self._query: SearchQuery | None = None
         self._found_count = 0
+        self._searching = False
+        self._error = ""
 
-        if text != "":
-            root_item = self.invisibleRootItem()
-            page: pymupdf.Page
-            for page in self._document:
-                quads: list = page.search_for(text, quads=True)
-                
-                if len(quads) > 0:
-                    self._found_count = self._found_count + len(quads)
-                    page_result = {"pno" : page.number, "label": page.get_label(), "quads" : quads}
-                    self._search_results.update({page.number: quads})
-                    search_item = SearchItem(page_result)
-                    root_item.appendRow(search_item)
-        
-        self.sigTextFound.emit(f"Hits: {self._found_count}")
+        self._search_pool = QtCore.QThreadPool(self)
+        self._search_pool.setMaxThreadCount(1)
+        self._search_signals = LibrarySignals(self)
+        self._search_signals.fileFound.connect(self.onFileFound)
+        self._search_signals.finished.connect(self.onSearchFinished)
+        self._search_ticket: int = 0
 
-    def foundCount(self):
-        return self._found_count
-    
-    def getSearchResults(self):
-        return self._search_results
+    def library(self) -> Library:
+        return self._library
+
+    def cancelSearch(self):
+        self._search_ticket += 1
+        self._search_pool.clear()
+        self._searching = False
+
+    def isCancelled(self, ticket: int) -> bool:
+        return ticket != self._search_ticket
+
+    def searchFor(self, text: str, case_sensitive: bool = False, whole_word: bool = False, regex: bool = False):
+        self.cancelSearch()
+        self.clear()
+        self._found_count = 0
+        self._error = ""
+        self._query = SearchQuery(text, case_sensitive, whole_word, regex)
+
+        if self._query.terms():
+            try:
+                worker = LibrarySearchWorker(self._library.indexedFiles(), self._query, self._search_ticket, self.isCancelled, self._search_signals)
+            except re.error as e:
+                self._error = f"Invalid expression: {e}"
+            else:
+                self._searching = True
+                self._search_pool.start(worker)
+
+        self.sigStatusChanged.emit(self.statusText())
+
+    def query(self) -> SearchQuery | None:
+        return self._query
+
+    @Slot(int, str, list)
+    def onFileFound(self, ticket: int, filename: str, hits: list):
+        if self.isCancelled(ticket):
+            return
+
+        file_item = LibraryItem(filename, hits=sum(count for _, _, count in hits))
+        for pno, label, count in hits:
+            file_item.appendRow(LibraryItem(filename, pno, label, count))
+        self.invisibleRootItem().appendRow(file_item)
+
+        self._found_count += file_item.hits
+        self.sigStatusChanged.emit(self.statusText())
+
+    @Slot(int)
+    def onSearchFinished(self, ticket: int):
+        if self.isCancelled(ticket):
+            return
+        self._searching = False
+        self.sigStatusChanged.emit(self.statusText())
+
+    @Slot()
+    def onLibraryChanged(self):
+        self.sigStatusChanged.emit(self.statusText())
+
+    def isSearching(self) -> bool:
+        return self._searching
+
+    def statusText(self) -> str:
+        files = f"Files: {len(self._library.indexedFiles())}/{len(self._library.files())} indexed"
+        if self._error:
+            return f"{files}\n{self._error}"
+        return f"{files}\nHits: {self._found_count}{' ...' if self._searching else ''}"
     
 class MetaDataWidget(QtWidgets.QWidget):
     def __init__(self, parent=None):
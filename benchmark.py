@@ -0,0 +1,62 @@
+"""
+    Compare pymupdf.Pixmap -> QtGui.QPixmap conversions
+
+    PNG round trip (Pixmap.tobytes + QPixmap.loadFromData) vs zero-copy QImage wrapper (render.toQImage)
+
+    usage: python benchmark.py [file.pdf] [zoom] [repeat]
+"""
+import sys
+import time
+import pymupdf
+
+from PyQt6 import QtGui
+
+from render import toQImage
+
+
+def pngPath(fitzpix: pymupdf.Pixmap) -> QtGui.QPixmap:
+    pixmap = QtGui.QPixmap()
+    pixmap.loadFromData(fitzpix.tobytes())
+    return pixmap
+
+
+def zeroCopyPath(fitzpix: pymupdf.Pixmap) -> QtGui.QPixmap:
+    return QtGui.QPixmap.fromImage(toQImage(fitzpix))
+
+
+def timeit(convert, pixmaps: list[pymupdf.Pixmap], repeat: int) -> float:
+    """Return the best total time in seconds over repeat runs"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for fitzpix in pixmaps:
+            convert(fitzpix)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    filename = sys.argv[1] if len(sys.argv) > 1 else "resources/Sample PDF.pdf"
+    zoom = float(sys.argv[2]) if len(sys.argv) > 2 else 2.0
+    repeat = int(sys.argv[3]) if len(sys.argv) > 3 else 5
+
+    app = QtGui.QGuiApplication(sys.argv)
+
+    doc = pymupdf.Document(filename)
+    mat = pymupdf.Matrix(zoom, zoom)
+
+    start = time.perf_counter()
+    pixmaps = [page.get_displaylist().get_pixmap(alpha=0, matrix=mat) for page in doc]
+    raster = time.perf_counter() - start
+
+    png = timeit(pngPath, pixmaps, repeat)
+    zero_copy = timeit(zeroCopyPath, pixmaps, repeat)
+
+    print(f"{filename}: {len(pixmaps)} pages at zoom {zoom}")
+    print(f"rasterization  : {raster * 1000:9.1f} ms")
+    print(f"png round trip : {png * 1000:9.1f} ms")
+    print(f"zero-copy      : {zero_copy * 1000:9.1f} ms  (x{png / zero_copy:.1f})")
+
+
+if __name__ == '__main__':
+    main()
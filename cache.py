@@ -0,0 +1,137 @@
+import pymupdf
+import threading
+
+from collections import OrderedDict
+from typing import Callable, Hashable
+
+from PyQt6 import QtGui
+
+
+class LRUCache:
+    """
+        Thread-safe mapping bounded by an entry count and/or a byte budget
+        The least recently used entries are evicted first. Hits and misses are counted.
+    """
+    def __init__(self, max_entries: int | None = None, max_bytes: int | None = None, sizeof: Callable[[object], int] | None = None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof  # size of a value in bytes, when not given to insert()
+
+        self.hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+        self.current_bytes: int = 0
+
+        self._entries: OrderedDict[Hashable, tuple[object, int]] = OrderedDict()  # key: (value, size)
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def peek(self, key: Hashable, default=None):
+        """Return the value of key without counting a hit or refreshing it"""
+        with self._lock:
+            entry = self._entries.get(key)
+            return default if entry is None else entry[0]
+
+    def insert(self, key: Hashable, value, size: int | None = None):
+        if size is None:
+            size = self.sizeof(value) if self.sizeof is not None else 0
+
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.current_bytes -= old[1]
+            self._entries[key] = (value, size)
+            self.current_bytes += size
+            self._evict()
+
+    def pop(self, key: Hashable, default=None):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                return default
+            self.current_bytes -= entry[1]
+            return entry[0]
+
+    def invalidate(self, predicate: Callable[[Hashable], bool] | None = None):
+        """Drop the entries whose key matches predicate, or every entry"""
+        with self._lock:
+            if predicate is None:
+                self._entries.clear()
+                self.current_bytes = 0
+                return
+            for key in [key for key in self._entries if predicate(key)]:
+                self.current_bytes -= self._entries.pop(key)[1]
+
+    def clear(self):
+        self.invalidate()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def keys(self) -> list:
+        with self._lock:
+            return list(self._entries)
+
+    def stats(self) -> dict:
+        return {"entries": len(self), "bytes": self.current_bytes,
+                "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+    def _evict(self):
+        # the most recent entry is kept even if it exceeds the budget alone
+        while len(self._entries) > 1 and (
+                (self.max_entries is not None and len(self._entries) > self.max_entries) or
+                (self.max_bytes is not None and self.current_bytes > self.max_bytes)):
+            _, (_, size) = self._entries.popitem(last=False)
+            self.current_bytes -= size
+            self.evictions += 1
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+
+FILTERED_STREAM_RATIO = 5  # typical inflation of a compressed content stream
+
+
+def streamLength(document: pymupdf.Document, xref: int) -> int:
+    """Return the decoded length of stream xref, estimated from its dictionary"""
+    kind, value = document.xref_get_key(xref, "Length")
+    if kind == "xref":  # indirect: "n 0 R"
+        value = document.xref_object(int(value.split()[0]))
+    try:
+        length = int(value)
+    except ValueError:
+        return 0
+    kind, _ = document.xref_get_key(xref, "Filter")
+    return length * FILTERED_STREAM_RATIO if kind != "null" else length
+
+
+def displayListSize(page: pymupdf.Page) -> int:
+    """
+        Estimate the memory held by the display list of page
+
+        MuPDF does not report it: the content stream length is a fair proxy of the number of recorded operations.
+        It is read from the stream dictionaries, the streams are not decompressed.
+    """
+    document = page.parent
+    if not document.is_pdf:
+        return 4096
+    return 4096 + 2 * sum(streamLength(document, xref) for xref in page.get_contents())
+
+
+def pixmapSize(pixmap: QtGui.QPixmap | QtGui.QImage) -> int:
+    """Return the memory held by pixmap in bytes"""
+    return pixmap.width() * pixmap.height() * pixmap.depth() // 8
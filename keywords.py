@@ -0,0 +1,170 @@
+import csv
+import json
+import pymupdf
+
+from collections import deque
+from typing import Callable, Iterator
+
+from PyQt6 import QtCore
+from PyQt6.QtCore import pyqtSignal as Signal
+
+from cache import LRUCache
+from search import SearchIndex, fold, pageWords
+
+
+def isWordCharacter(c: str) -> bool:
+    return c.isalnum() or c == "_"
+
+
+class KeywordMatcher:
+    """
+        Aho-Corasick automaton: finds the occurrences of many terms in a single pass over a text
+
+        Overlapping occurrences of different terms are all reported.
+        Whitespace inside a term matches the single spaces of PageWords.text.
+    """
+    def __init__(self, terms: list[str], case_sensitive: bool = False, whole_word: bool = False):
+        self.terms = terms
+        self.case_sensitive = case_sensitive
+        self.whole_word = whole_word
+
+        self._goto: list[dict[str, int]] = [{}]
+        self._fail: list[int] = [0]
+        self._output: list[list[int]] = [[]]  # terms ending at each state
+        self._lengths: list[int] = []
+
+        for i, term in enumerate(terms):
+            key = self.normalize(term)
+            self._lengths.append(len(key))
+            if not key:
+                continue
+            state = 0
+            for c in key:
+                next_state = self._goto[state].get(c)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append([])
+                    self._goto[state][c] = next_state
+                state = next_state
+            self._output[state].append(i)
+
+        # failure links, breadth first: the longest proper suffix also in the trie
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for c, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and c not in self._goto[fail]:
+                    fail = self._fail[fail]
+                fail = self._goto[fail].get(c, 0)
+                self._fail[next_state] = fail if fail != next_state else 0
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+    def normalize(self, text: str) -> str:
+        text = " ".join(text.split())
+        return text if self.case_sensitive else fold(text)
+
+    def finditer(self, text: str) -> Iterator[tuple[int, int, int]]:
+        """Yield the occurrences (term index, start, end) in text"""
+        haystack = text if self.case_sensitive else fold(text)
+        goto, fail, output, lengths = self._goto, self._fail, self._output, self._lengths
+
+        state = 0
+        for end, c in enumerate(haystack, 1):
+            while state and c not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(c, 0)
+            for i in output[state]:
+                start = end - lengths[i]
+                if self.whole_word and ((start > 0 and isWordCharacter(haystack[start - 1])) or
+                                        (end < len(haystack) and isWordCharacter(haystack[end]))):
+                    continue
+                yield i, start, end
+
+
+def readKeywords(filename: str) -> list[str]:
+    """Read a keyword list: one term per line, blank lines and lines starting with # ignored"""
+    with open(filename, encoding="utf-8-sig") as f:
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith("#")]
+
+
+class KeywordResults:
+    """Hits of a batch search: for each term, pno: quads"""
+    def __init__(self, terms: list[str]):
+        self.terms = terms
+        self.labels: dict[int, str] = {}
+        self.hits: list[dict[int, list[pymupdf.Quad]]] = [{} for _ in terms]
+
+    def addPage(self, pno: int, label: str, page_hits: dict[int, list[pymupdf.Quad]]):
+        self.labels[pno] = label
+        for i, quads in page_hits.items():
+            self.hits[i][pno] = quads
+
+    def count(self, i: int) -> int:
+        """Return the number of hits of term i"""
+        return sum(len(quads) for quads in self.hits[i].values())
+
+    def counts(self) -> dict[str, int]:
+        return {term: self.count(i) for i, term in enumerate(self.terms)}
+
+    def exportCsv(self, filename: str):
+        """One row per term and page holding it, then one row per term never found"""
+        with open(filename, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["term", "total", "index", "label", "hits"])
+            for i, term in enumerate(self.terms):
+                total = self.count(i)
+                if not self.hits[i]:
+                    writer.writerow([term, 0, "", "", 0])
+                for pno, quads in sorted(self.hits[i].items()):
+                    writer.writerow([term, total, pno, self.labels.get(pno, ""), len(quads)])
+
+    def exportJson(self, filename: str, document: str = ""):
+        terms = []
+        for i, term in enumerate(self.terms):
+            pages = [{"index": pno, "label": self.labels.get(pno, ""), "hits": len(quads),
+                      "quads": [[round(coordinate, 2) for point in quad for coordinate in point] for quad in quads]}
+                     for pno, quads in sorted(self.hits[i].items())]
+            terms.append({"term": term, "total": self.count(i), "pages": pages})
+        with open(filename, "w", encoding="utf-8") as f:
+            json.dump({"document": document, "terms": terms}, f, indent=2, ensure_ascii=False)
+
+
+class KeywordSignals(QtCore.QObject):
+    pageScanned = Signal(int, int, str, dict)  # ticket, pno, page label, {term index: quads}
+    progress = Signal(int, int)  # ticket, pages scanned
+    finished = Signal(int)  # ticket
+
+
+class KeywordWorker(QtCore.QRunnable):
+    """Scan the words of each page once for all the terms of a KeywordMatcher, off the GUI thread"""
+    def __init__(self, document: pymupdf.Document, matcher: KeywordMatcher, ticket: int, is_cancelled: Callable[[int], bool],
+                 signals: KeywordSignals, index: SearchIndex | None = None, words_cache: LRUCache | None = None):
+        super().__init__()
+        self.document = document
+        self.matcher = matcher
+        self.ticket = ticket
+        self.is_cancelled = is_cancelled
+        self.signals = signals
+        self.index = index
+        self.words_cache = words_cache
+
+    def run(self):
+        for pno in range(self.document.page_count):
+            if self.is_cancelled(self.ticket):
+                return
+
+            label, words = pageWords(self.document, pno, self.index, self.words_cache)
+            page_hits: dict[int, list[pymupdf.Quad]] = {}
+            for i, start, end in self.matcher.finditer(words.text):
+                page_hits.setdefault(i, []).extend(words.spanQuads(start, end))
+
+            if page_hits:
+                self.signals.pageScanned.emit(self.ticket, pno, label, page_hits)
+            if pno % 16 == 15:
+                self.signals.progress.emit(self.ticket, pno + 1)
+
+        self.signals.finished.emit(self.ticket)
@@ -0,0 +1,299 @@
+import os
+import pymupdf
+import sqlite3
+import logging
+
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context
+from typing import Callable
+
+from PyQt6 import QtCore
+from PyQt6.QtCore import pyqtSignal as Signal, pyqtSlot as Slot
+
+from search import SearchIndex, SearchQuery, indexPages
+from sidecar import Sidecar, fileStamp
+
+logger = logging.getLogger(__name__)
+
+
+def libraryFiles(directory: str) -> list[str]:
+    """Return the PDF files of the directory tree, sorted"""
+    files = []
+    for root, dirs, names in os.walk(directory):
+        dirs.sort()
+        files.extend(os.path.join(root, name) for name in sorted(names) if name.lower().endswith(".pdf"))
+    return files
+
+
+def indexDocument(filename: str) -> str:
+    """
+        Process pool worker: build the sidecar search index of filename
+        Return the stamp of the version indexed
+    """
+    stamp = fileStamp(filename)
+    doc = pymupdf.Document(filename)
+    index = SearchIndex(Sidecar(filename))
+    try:
+        indexPages(doc, index)
+    finally:
+        index.close()
+        doc.close()
+    return stamp
+
+
+class Library(QtCore.QObject):
+    """
+        Folder of PDF files searched together
+
+        Each file is indexed in its own sidecar by a pool of processes: the indexes are shared with the document view.
+        The directory tree is watched, new and modified files are indexed again.
+
+        When a process dies, every file in flight fails with its pool: the pool is replaced and these files are
+        indexed again one at a time by a process of their own. A file crashing it max_crashes times is marked failed.
+    """
+    sigChanged = Signal()  # files added, removed or indexed
+    _sigIndexed = Signal(str, str)  # filename, stamp indexed; emitted from the executor thread
+    _sigBroken = Signal(str, object, object)  # filename, future, executor whose process died; from the executor thread
+
+    def __init__(self, max_workers: int | None = None, parent=None):
+        super().__init__(parent)
+
+        self.directory = ""
+        self.max_workers = max_workers
+        self.failed: set[str] = set()  # files that cannot be indexed, until modified
+        self.max_crashes = 2
+
+        self._stamps: dict[str, str | None] = {}  # filename: stamp of the version indexed, None until indexed
+        self._futures: dict[str, Future] = {}
+        self._executor: ProcessPoolExecutor | None = None
+
+        # files in flight when a process died, indexed one at a time to find the one crashing
+        self._suspects: deque[str] = deque()
+        self._crashes: dict[str, int] = {}  # filename: processes it crashed alone
+        self._alone_executor: ProcessPoolExecutor | None = None
+        self._alone_file: str | None = None
+
+        self._watcher = QtCore.QFileSystemWatcher(self)
+        self._watcher.directoryChanged.connect(self.rescan)
+        self._watcher.fileChanged.connect(self.rescan)
+        self._sigIndexed.connect(self.onIndexed)
+        self._sigBroken.connect(self.onBroken)
+
+    def setDirectory(self, directory: str):
+        for future in self._futures.values():
+            future.cancel()
+        self._futures.clear()
+        self._suspects.clear()
+        self._crashes.clear()
+        self._alone_file = None
+        self._stamps.clear()
+        self.failed.clear()
+        if self._watcher.files() or self._watcher.directories():
+            self._watcher.removePaths(self._watcher.files() + self._watcher.directories())
+
+        self.directory = directory
+        self.rescan()
+
+    @Slot()
+    def rescan(self):
+        """Index the new and modified files, forget the removed ones"""
+        if not self.directory:
+            return
+
+        files = libraryFiles(self.directory)
+        for filename in set(self._stamps) - set(files):
+            future = self._futures.pop(filename, None)
+            if future is not None:
+                future.cancel()
+            del self._stamps[filename]
+            if filename in self._suspects:
+                self._suspects.remove(filename)
+            self._crashes.pop(filename, None)
+            self.failed.discard(filename)
+
+        for filename in files:
+            if filename in self._futures or filename in self._suspects:
+                continue  # checked again once indexed
+            try:
+                stamp = fileStamp(filename)
+            except OSError:
+                continue
+            if filename not in self._stamps or self._stamps[filename] != stamp:
+                self.submit(filename)
+
+        directories = [root for root, _, _ in os.walk(self.directory)]
+        watched = set(self._watcher.files() + self._watcher.directories())
+        missing = [path for path in directories + files if path not in watched]
+        if missing:
+            self._watcher.addPaths(missing)
+
+        self.sigChanged.emit()
+
+    def submit(self, filename: str):
+        if self._executor is None:
+            # spawn: forking a process running Qt threads is unsafe
+            self._executor = ProcessPoolExecutor(self.max_workers, mp_context=get_context("spawn"))
+        self._stamps.setdefault(filename, None)
+        self.failed.discard(filename)
+        executor = self._executor
+        try:
+            future = executor.submit(indexDocument, filename)
+        except BrokenProcessPool:  # died before its futures reported it
+            self.dropExecutor(executor)
+            self._suspects.append(filename)
+            self.submitSuspect()
+            return
+        self._futures[filename] = future
+        future.add_done_callback(lambda future: self._finished(filename, future, executor))
+
+    def submitSuspect(self):
+        """Index the next file that was in flight when a process died, alone"""
+        if self._alone_file is not None or not self._suspects:
+            return
+        filename = self._suspects.popleft()
+        if self._alone_executor is None:
+            self._alone_executor = ProcessPoolExecutor(1, mp_context=get_context("spawn"))
+        executor = self._alone_executor
+        self._alone_file = filename
+        future = executor.submit(indexDocument, filename)
+        self._futures[filename] = future
+        future.add_done_callback(lambda future: self._finished(filename, future, executor))
+
+    def dropExecutor(self, executor: ProcessPoolExecutor):
+        """Forget a broken executor: the next file submitted starts a new pool"""
+        executor.shutdown(wait=False, cancel_futures=True)
+        if executor is self._executor:
+            self._executor = None
+        elif executor is self._alone_executor:
+            self._alone_executor = None
+
+    def _finished(self, filename: str, future: Future, executor: ProcessPoolExecutor):
+        if future.cancelled():
+            return
+        try:
+            stamp = future.result()
+        except BrokenProcessPool:
+            self._sigBroken.emit(filename, future, executor)
+            return
+        except Exception as e:
+            logger.error(f"Cannot index {filename}: {e}")
+            try:
+                stamp = "!" + fileStamp(filename)  # not retried until modified
+            except OSError:
+                stamp = "!"
+        self._sigIndexed.emit(filename, stamp)
+
+    @Slot(str, object, object)
+    def onBroken(self, filename: str, future: Future, executor: ProcessPoolExecutor):
+        alone = executor is self._alone_executor and filename == self._alone_file
+        if executor in (self._executor, self._alone_executor):
+            self.dropExecutor(executor)
+        if self._futures.get(filename) is not future:
+            return  # removed or submitted again meanwhile
+        del self._futures[filename]
+
+        if not alone:
+            self._suspects.append(filename)
+        else:
+            self._alone_file = None
+            crashes = self._crashes[filename] = self._crashes.get(filename, 0) + 1
+            if crashes < self.max_crashes:
+                self._suspects.appendleft(filename)
+            else:
+                logger.error(f"Cannot index {filename}: the indexing process died {crashes} times")
+                try:
+                    self.onIndexed(filename, "!" + fileStamp(filename))  # not retried until modified
+                except OSError:
+                    self.onIndexed(filename, "!")
+        self.submitSuspect()
+
+    @Slot(str, str)
+    def onIndexed(self, filename: str, stamp: str):
+        self._futures.pop(filename, None)
+        if filename == self._alone_file:
+            self._alone_file = None
+            self.submitSuspect()
+        if filename not in self._stamps:
+            return  # removed meanwhile
+        self._crashes.pop(filename, None)
+
+        if stamp.startswith("!"):
+            self.failed.add(filename)
+            stamp = stamp[1:]
+        self._stamps[filename] = stamp
+
+        try:
+            if fileStamp(filename) != stamp:
+                self.submit(filename)  # modified while indexed
+        except OSError:
+            pass
+        self.sigChanged.emit()
+
+    def files(self) -> list[str]:
+        return sorted(self._stamps)
+
+    def indexedFiles(self) -> list[str]:
+        return sorted(filename for filename, stamp in self._stamps.items() if stamp and filename not in self.failed)
+
+    def isIndexing(self) -> bool:
+        return bool(self._futures or self._suspects)
+
+    def shutdown(self):
+        for executor in (self._executor, self._alone_executor):
+            if executor is not None:
+                self.dropExecutor(executor)
+        self._futures.clear()
+        self._suspects.clear()
+        self._alone_file = None
+
+
+class LibrarySignals(QtCore.QObject):
+    fileFound = Signal(int, str, list)  # ticket, filename, hits [(pno, page label, hit count)]
+    finished = Signal(int)  # ticket
+
+
+class LibrarySearchWorker(QtCore.QRunnable):
+    """Search the sidecar indexes of the library files one after the other, off the GUI thread"""
+    def __init__(self, files: list[str], query: SearchQuery, ticket: int, is_cancelled: Callable[[int], bool], signals: LibrarySignals):
+        super().__init__()
+        self.files = files
+        self.query = query
+        self.pattern = None if query.isPlain() else query.pattern()
+        self.ticket = ticket
+        self.is_cancelled = is_cancelled
+        self.signals = signals
+
+    def run(self):
+        for filename in self.files:
+            if self.is_cancelled(self.ticket):
+                return
+            try:
+                hits = self.searchFile(filename)
+            except (OSError, sqlite3.Error) as e:
+                logger.error(f"Cannot search {filename}: {e}")
+                continue
+            if hits:
+                self.signals.fileFound.emit(self.ticket, filename, hits)
+
+        self.signals.finished.emit(self.ticket)
+
+    def searchFile(self, filename: str) -> list[tuple[int, str, int]]:
+        index = SearchIndex(Sidecar(filename))
+        try:
+            candidates = index.candidatePages(self.query)
+            hits = []
+            for pno in sorted(candidates if candidates is not None else index.indexedPages()):
+                if self.is_cancelled(self.ticket):
+                    break
+                entry = index.page(pno)
+                if entry is None:
+                    continue
+                label, words = entry
+                quads = words.find(self.query.text) if self.pattern is None else words.match(self.pattern)
+                if quads:
+                    hits.append((pno, label, len(quads)))
+            return hits
+        finally:
+            index.close()
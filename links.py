@@ -0,0 +1,401 @@
+import pymupdf
+import sqlite3
+import logging
+
+from array import array
+from bisect import bisect_left, insort
+from math import isnan, nan
+from typing import Callable, Iterable, Iterator
+
+from PyQt6 import QtCore
+from PyQt6.QtCore import pyqtSignal as Signal
+
+from cache import LRUCache
+from render import fitz_lock
+from search import PageWords, SearchIndex, pageWords
+from sidecar import Sidecar
+
+logger = logging.getLogger(__name__)
+
+
+class LinkStore:
+    """
+        Links of a document in columns: one array entry per link, URIs and named destinations in a string table
+
+        Links are added page by page, the links of a page are contiguous. Labels are kept apart, once resolved.
+    """
+    def __init__(self):
+        self.kinds = array("b")
+        self.xrefs = array("i")
+        self.pages_from = array("i")
+        self.pages_to = array("i")  # -1 if none
+        self.hotspots = array("d")  # x0, y0, x1, y1 per link
+        self.targets = array("d")  # x, y per link, nan if none
+        self.zooms = array("d")
+        self.names = array("i")  # URI or named destination in strings, -1 if none
+        self.strings: list[str] = []
+        self.labels: dict[int, str] = {}  # link: label
+        self._string_ids: dict[str, int] = {}
+        self._pages: dict[int, range] = {}  # pno: links
+
+    def __len__(self) -> int:
+        return len(self.kinds)
+
+    def stringId(self, string: str | None) -> int:
+        if string is None:
+            return -1
+        i = self._string_ids.get(string)
+        if i is None:
+            i = self._string_ids[string] = len(self.strings)
+            self.strings.append(string)
+        return i
+
+    def addPage(self, pno: int, links: Iterable[dict]):
+        """Append the links of page pno, as returned by page.links()"""
+        start = len(self.kinds)
+        for link in links:
+            self.kinds.append(link["kind"])
+            self.xrefs.append(link.get("xref", 0))
+            self.pages_from.append(pno)
+            self.pages_to.append(link.get("page", -1))
+            self.hotspots.extend(link["from"])
+            to = link.get("to")
+            self.targets.extend((to.x, to.y) if to is not None else (nan, nan))
+            self.zooms.append(link.get("zoom", 1.0))
+            self.names.append(self.stringId(link.get("uri", link.get("nameddest"))))
+        if len(self.kinds) > start:
+            self._pages[pno] = range(start, len(self.kinds))
+
+    def extend(self, other: "LinkStore"):
+        """Append the links of other, from later pages"""
+        offset = len(self.kinds)
+        for column in ("kinds", "xrefs", "pages_from", "pages_to", "hotspots", "targets", "zooms"):
+            getattr(self, column).extend(getattr(other, column))
+        self.names.extend(self.stringId(other.strings[i]) if i >= 0 else -1 for i in other.names)
+        self.labels.update((i + offset, label) for i, label in other.labels.items())
+        self._pages.update((pno, range(links.start + offset, links.stop + offset)) for pno, links in other._pages.items())
+
+    def pageLinks(self, pno: int) -> range:
+        return self._pages.get(pno, range(0))
+
+    def hotspot(self, i: int) -> pymupdf.Rect:
+        return pymupdf.Rect(*self.hotspots[4 * i:4 * i + 4])
+
+    def target(self, i: int) -> pymupdf.Point | None:
+        x, y = self.targets[2 * i:2 * i + 2]
+        return None if isnan(x) else pymupdf.Point(x, y)
+
+    def name(self, i: int) -> str:
+        return self.strings[self.names[i]] if self.names[i] >= 0 else ""
+
+    def resolveNames(self, destinations: "NamedDestinations"):
+        """Set the target of the NAMED links from the destinations resolved for the document"""
+        for i, kind in enumerate(self.kinds):
+            if kind != pymupdf.LINK_NAMED:
+                continue
+            destination = destinations.resolve(self.name(i))
+            if destination is None:
+                continue
+            self.pages_to[i], to, self.zooms[i] = destination
+            self.targets[2 * i:2 * i + 2] = array("d", (to.x, to.y) if to is not None else (nan, nan))
+
+
+class LinkSignals(QtCore.QObject):
+    pagesLinked = Signal(int, object)  # ticket, LinkStore of a few pages
+    graphBuilt = Signal(int, object)  # ticket, LinkGraph
+    namesResolved = Signal(int, object)  # ticket, NamedDestinations
+    labelsRead = Signal(int, list, dict)  # ticket, pages, {link: label}
+    finished = Signal(int)  # ticket
+
+
+class LinkWorker(QtCore.QRunnable):
+    """
+        Extract the links of the document page by page off the GUI thread
+        Links are emitted every batch_size pages, as a LinkStore; labels are left unresolved.
+    """
+    def __init__(self, document: pymupdf.Document, kinds: list[int], ticket: int, is_cancelled: Callable[[int], bool],
+                 signals: LinkSignals, batch_size: int = 16):
+        super().__init__()
+        self.document = document
+        self.kinds = kinds
+        self.ticket = ticket
+        self.is_cancelled = is_cancelled
+        self.signals = signals
+        self.batch_size = batch_size
+
+    def run(self):
+        batch = LinkStore()
+        for pno in range(self.document.page_count):
+            if self.is_cancelled(self.ticket):
+                return
+
+            with fitz_lock:
+                page: pymupdf.Page = self.document.load_page(pno)
+                batch.addPage(pno, page.links(self.kinds))
+
+            if len(batch) and pno % self.batch_size == self.batch_size - 1:
+                self.signals.pagesLinked.emit(self.ticket, batch)
+                batch = LinkStore()
+
+        if len(batch):
+            self.signals.pagesLinked.emit(self.ticket, batch)
+        self.signals.finished.emit(self.ticket)
+
+
+class LabelWorker(QtCore.QRunnable):
+    """
+        Read the labels of the links of a few pages from the page words, off the GUI thread
+        read_labels(pno, words) returns the labels of the links of page pno: {link: label}
+    """
+    def __init__(self, document: pymupdf.Document, pages: list[int], read_labels: Callable[[int, PageWords], dict[int, str]],
+                 ticket: int, is_cancelled: Callable[[int], bool], signals: LinkSignals, index: SearchIndex | None = None,
+                 words_cache: LRUCache | None = None):
+        super().__init__()
+        self.document = document
+        self.pages = pages
+        self.read_labels = read_labels
+        self.ticket = ticket
+        self.is_cancelled = is_cancelled
+        self.signals = signals
+        self.index = index
+        self.words_cache = words_cache
+
+    def run(self):
+        labels = {}
+        try:
+            for pno in self.pages:
+                if self.is_cancelled(self.ticket):
+                    return
+                _, words = pageWords(self.document, pno, self.index, self.words_cache)
+                labels.update(self.read_labels(pno, words))
+        except sqlite3.Error as e:
+            logger.error(f"Cannot read the words of {self.document.name}: {e}")
+        finally:
+            if self.index is not None:
+                self.index.close()
+        self.signals.labelsRead.emit(self.ticket, self.pages, labels)
+
+
+def openSidecar(document: pymupdf.Document) -> Sidecar | None:
+    """Return the sidecar of document, None if it cannot be stored"""
+    if not document.name:
+        return None
+    try:
+        return Sidecar(document.name)
+    except (OSError, sqlite3.Error) as e:
+        logger.warning(f"No sidecar for {document.name}: {e}")
+        return None
+
+
+class NamedDestinations:
+    """
+        Named destinations of a document, all resolved at once: name: (page, target point, zoom)
+
+        Targets are in page coordinates like those of GOTO links (MuPDF reports them in PDF coordinates),
+        None for the destinations without position such as /Fit.
+        Kept in the document sidecar once resolved.
+    """
+    def __init__(self, destinations: dict[str, tuple[int, pymupdf.Point | None, float]] | None = None):
+        self.destinations = destinations if destinations is not None else {}
+
+    def __len__(self) -> int:
+        return len(self.destinations)
+
+    def resolve(self, name: str) -> tuple[int, pymupdf.Point | None, float] | None:
+        return self.destinations.get(name)
+
+    version = "2"  # stored with the destinations, older ones are resolved again
+
+    # index of the top coordinate in the destination arrays that give one
+    top_indexes = {"XYZ": 3, "FitH": 2, "FitBH": 2, "FitR": 5}
+
+    @staticmethod
+    def hasTop(document: pymupdf.Document, name: str) -> bool:
+        """
+            Whether the destination array of name gives a top coordinate
+            resolve_names reports (x, 0) for /Fit, /FitB, /FitV, /FitBV and /XYZ with a null top: no position on the page
+        """
+        pdf = pymupdf.mupdf.pdf_document_from_fz_document(document)
+        destination = pymupdf.mupdf.pdf_lookup_dest(pdf, pymupdf.mupdf.pdf_new_text_string(name))
+        if destination.pdf_is_dict():
+            destination = destination.pdf_dict_gets("D")
+        if not destination.pdf_is_array():
+            return False
+        top_index = NamedDestinations.top_indexes.get(destination.pdf_array_get(1).pdf_to_name())
+        return top_index is not None and destination.pdf_array_get(top_index).pdf_is_number()
+
+    @staticmethod
+    def fromDocument(document: pymupdf.Document) -> "NamedDestinations":
+        destinations = {}
+        if not document.is_pdf:
+            return NamedDestinations(destinations)
+        with fitz_lock:
+            names = document.resolve_names()
+            cropboxes: dict[int, pymupdf.Rect] = {}
+            for name, destination in names.items():
+                pno = destination.get("page", -1)
+                if not 0 <= pno < document.page_count:
+                    continue
+                to = destination.get("to")
+                if to is not None and to[1] == 0 and not NamedDestinations.hasTop(document, name):
+                    to = None  # top of the page
+                if to is not None:
+                    if pno not in cropboxes:
+                        cropboxes[pno] = document.page_cropbox(pno)
+                    cropbox = cropboxes[pno]
+                    to = pymupdf.Point(to[0] - cropbox.x0, cropbox.y1 - to[1])
+                destinations[name] = (pno, to, destination.get("zoom") or 1.0)  # 0: zoom unchanged
+        return NamedDestinations(destinations)
+
+    @staticmethod
+    def load(sidecar: Sidecar) -> "NamedDestinations | None":
+        """Return the destinations stored in sidecar, None if not resolved yet"""
+        connection = sidecar.connection()
+        row = connection.execute("SELECT value FROM meta WHERE key = 'named_destinations'").fetchone()
+        if row is None or row[0] != NamedDestinations.version:
+            return None
+        rows = connection.execute("SELECT name, page, x, y, zoom FROM named_destinations")
+        return NamedDestinations({name: (page, pymupdf.Point(x, y) if x is not None else None, zoom)
+                                  for name, page, x, y, zoom in rows})
+
+    def store(self, sidecar: Sidecar):
+        connection = sidecar.connection()
+        with connection:
+            connection.execute("CREATE TABLE IF NOT EXISTS named_destinations(name TEXT PRIMARY KEY, page INTEGER, "
+                               "x REAL, y REAL, zoom REAL) WITHOUT ROWID")
+            connection.execute("DELETE FROM named_destinations")
+            connection.executemany("INSERT INTO named_destinations(name, page, x, y, zoom) VALUES (?, ?, ?, ?, ?)",
+                                   ((name, page, to.x if to is not None else None, to.y if to is not None else None, zoom)
+                                    for name, (page, to, zoom) in self.destinations.items()))
+            connection.execute("INSERT OR REPLACE INTO meta(key, value) VALUES ('named_destinations', ?)",
+                               (NamedDestinations.version,))
+
+
+class NamedDestinationsWorker(QtCore.QRunnable):
+    """Load the named destinations of the document from its sidecar, or resolve them all and store them, off the GUI thread"""
+    def __init__(self, document: pymupdf.Document, ticket: int, is_cancelled: Callable[[int], bool], signals: LinkSignals):
+        super().__init__()
+        self.document = document
+        self.ticket = ticket
+        self.is_cancelled = is_cancelled
+        self.signals = signals
+
+    def run(self):
+        if self.is_cancelled(self.ticket):
+            return
+
+        sidecar = openSidecar(self.document)
+        try:
+            destinations = None
+            if sidecar is not None:
+                try:
+                    destinations = NamedDestinations.load(sidecar)
+                except sqlite3.Error as e:
+                    logger.warning(f"Cannot read the named destinations of {self.document.name}: {e}")
+
+            if destinations is None:
+                destinations = NamedDestinations.fromDocument(self.document)
+                if sidecar is not None:
+                    try:
+                        destinations.store(sidecar)
+                    except sqlite3.Error as e:
+                        logger.warning(f"Cannot store the named destinations of {self.document.name}: {e}")
+            self.signals.namesResolved.emit(self.ticket, destinations)
+        finally:
+            if sidecar is not None:
+                sidecar.close()
+
+
+class LinkGraph:
+    """
+        Internal links of a document between pages: the pages each page links to and the pages linking to it
+
+        Kept in the document sidecar once built, as one row per (page from, page to).
+    """
+    def __init__(self, edges: Iterator[tuple[int, int]] = ()):
+        self._targets: dict[int, list[int]] = {}  # pno: pages linked to, sorted
+        self._sources: dict[int, list[int]] = {}  # pno: pages linking to it, sorted
+        for page_from, page_to in edges:
+            self.addEdge(page_from, page_to)
+
+    def addEdge(self, page_from: int, page_to: int):
+        targets = self._targets.setdefault(page_from, [])
+        i = bisect_left(targets, page_to)
+        if i < len(targets) and targets[i] == page_to:
+            return
+        targets.insert(i, page_to)
+        insort(self._sources.setdefault(page_to, []), page_from)
+
+    def addLinks(self, links: LinkStore, page_count: int):
+        """Add the edges of the internal links of a LinkStore, their target page being known"""
+        for page_from, page_to in zip(links.pages_from, links.pages_to):
+            if 0 <= page_to < page_count:
+                self.addEdge(page_from, page_to)
+
+    def linksFrom(self, pno: int) -> list[int]:
+        return self._targets.get(pno, [])
+
+    def linksTo(self, pno: int) -> list[int]:
+        return self._sources.get(pno, [])
+
+    def edges(self) -> Iterator[tuple[int, int]]:
+        for page_from, targets in self._targets.items():
+            for page_to in targets:
+                yield page_from, page_to
+
+    @staticmethod
+    def load(sidecar: Sidecar) -> "LinkGraph | None":
+        """Return the graph stored in sidecar, None if not built yet"""
+        connection = sidecar.connection()
+        if connection.execute("SELECT 1 FROM meta WHERE key = 'link_graph'").fetchone() is None:
+            return None
+        return LinkGraph(connection.execute("SELECT page_from, page_to FROM link_graph"))
+
+    def store(self, sidecar: Sidecar):
+        connection = sidecar.connection()
+        with connection:
+            connection.execute("CREATE TABLE IF NOT EXISTS link_graph(page_from INTEGER, page_to INTEGER, "
+                               "PRIMARY KEY(page_from, page_to)) WITHOUT ROWID")
+            connection.execute("DELETE FROM link_graph")
+            connection.executemany("INSERT INTO link_graph(page_from, page_to) VALUES (?, ?)", self.edges())
+            connection.execute("INSERT OR REPLACE INTO meta(key, value) VALUES ('link_graph', 'built')")
+
+
+class LinkGraphWorker(QtCore.QRunnable):
+    """
+        Load the link graph of the document from its sidecar, off the GUI thread: graphBuilt gives None if not built yet
+        Or, given the graph built from the links listed by LinkWorker, store it in the sidecar.
+    """
+    def __init__(self, document: pymupdf.Document, ticket: int, is_cancelled: Callable[[int], bool], signals: LinkSignals,
+                 graph: LinkGraph | None = None):
+        super().__init__()
+        self.document = document
+        self.ticket = ticket
+        self.is_cancelled = is_cancelled
+        self.signals = signals
+        self.graph = graph
+
+    def run(self):
+        if self.is_cancelled(self.ticket):
+            return
+
+        sidecar = openSidecar(self.document)
+        try:
+            if self.graph is None:
+                graph = self.loadGraph(sidecar) if sidecar is not None else None
+                self.signals.graphBuilt.emit(self.ticket, graph)
+            elif sidecar is not None:
+                try:
+                    self.graph.store(sidecar)
+                except sqlite3.Error as e:
+                    logger.warning(f"Cannot store the link graph of {self.document.name}: {e}")
+        finally:
+            if sidecar is not None:
+                sidecar.close()
+
+    def loadGraph(self, sidecar: Sidecar) -> LinkGraph | None:
+        try:
+            return LinkGraph.load(sidecar)
+        except sqlite3.Error as e:
+            logger.warning(f"Cannot read the link graph of {self.document.name}: {e}")
+            return None
@@ -1,16 +1,30 @@
+import os
+import bisect
 import pymupdf
 import logging
 
+from collections.abc import Mapping
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
 from enum import Enum
 
 from PyQt6 import QtWidgets, QtGui, QtCore
 from PyQt6.QtCore import pyqtSignal as Signal, pyqtSlot as Slot
-from QtPymuPdf import OutlineModel, OutlineItem, PageNavigator, ZoomSelector, SearchModel, LinkModel, LinkItem, GoToLink, NamedLink, SearchItem, MetaDataWidget, TextSelection
+from QtPymuPdf import OutlineModel, OutlineItem, PageNavigator, ZoomSelector, SearchModel, LinkModel, LinkItem, LinkFactory, GoToLink, NamedLink, UriLink, MetaDataWidget, TextSelection
+from QtPymuPdf import LibraryModel, LibraryItem, KeywordModel, KeywordItem
+from keywords import readKeywords
+from library import Library
+from links import LinkGraph, LinkStore, NamedDestinations
 
 from resources import qrc_resources
 
+from search import BoxGrid
+from render import toQImage, tilesIn, PREVIEW, RenderJob, RenderSignals, RenderWorker, ProcessRenderBackend, fitz_lock
+
 from toolbar import ToolBar
 
+from cache import LRUCache, displayListSize, pixmapSize
+
 SUPPORTED_FORMART = ("png", "jpg", "jpeg", "bmp", "tiff", "pnm", "pam", "ps", "svg",
                      "pdf", "epub", "xps", "fb2", "cbz", "txt")
 
@@ -63,7 +77,75 @@ class MouseInteraction:
         self._interaction = i
 
 
+class PageItem(QtWidgets.QGraphicsRectItem):
+    """Page placeholder: a white rect of the page size holding the rendered pixmap or tiles as child items"""
+    def __init__(self, pno: int, rect: QtCore.QRectF, parent=None):
+        super(PageItem, self).__init__(rect, parent)
+
+        self.setBrush(QtGui.QColor(255, 255, 255))
+        self.setPen(QtGui.QPen(QtCore.Qt.PenStyle.NoPen))
+
+        self.pno = pno
+        self.pixmap_item: QtWidgets.QGraphicsPixmapItem | None = None
+        self.tiles: dict[tuple[int, int], QtWidgets.QGraphicsPixmapItem] = {}
+        self.pending: set[tuple[int, int] | str | None] = set()  # render jobs in flight: RenderJob.part
+        self.sharp = False  # pixmap_item holds a full resolution render, not a scaled preview
+        self.highlights: QtWidgets.QGraphicsPathItem | None = None
+
+    def setPixmap(self, pixmap: QtGui.QPixmap, scale: float = 1.0, sharp: bool = True):
+        if self.pixmap_item is None:
+            self.pixmap_item = QtWidgets.QGraphicsPixmapItem(self)
+            self.pixmap_item.setTransformationMode(QtCore.Qt.TransformationMode.SmoothTransformation)
+        self.pixmap_item.setPixmap(pixmap)
+        self.pixmap_item.setScale(scale)
+        self.sharp = sharp
+
+    def addTile(self, tile: tuple[int, int], pixmap: QtGui.QPixmap, position: QtCore.QPointF):
+        item = QtWidgets.QGraphicsPixmapItem(pixmap, self)
+        item.setPos(position)
+        item.setZValue(1)  # above the preview
+        self.tiles[tile] = item
+
+    def setHighlights(self, polygons: list[QtGui.QPolygonF]):
+        """Draw the highlighted areas (item coordinates) above the page as a single item"""
+        if not polygons:
+            if self.highlights is not None:
+                self.scene().removeItem(self.highlights)
+                self.highlights = None
+            return
+
+        path = QtGui.QPainterPath()
+        path.setFillRule(QtCore.Qt.FillRule.WindingFill)
+        for polygon in polygons:
+            path.addPolygon(polygon)
+
+        if self.highlights is None:
+            self.highlights = QtWidgets.QGraphicsPathItem(self)
+            self.highlights.setBrush(QtGui.QColor(255, 255, 0, 110))
+            self.highlights.setPen(QtGui.QPen(QtCore.Qt.PenStyle.NoPen))
+            self.highlights.setZValue(2)  # above tiles
+        self.highlights.setPath(path)
+
+    def removeTile(self, tile: tuple[int, int]):
+        self.scene().removeItem(self.tiles.pop(tile))
+
+    def release(self):
+        """Drop the rendered content: back to a cheap placeholder"""
+        if self.pixmap_item is not None:
+            self.scene().removeItem(self.pixmap_item)
+            self.pixmap_item = None
+        self.sharp = False
+        for tile in list(self.tiles):
+            self.removeTile(tile)
+        self.pending.clear()
+
+
 class PdfView(QtWidgets.QGraphicsView):
+
+    class PageMode(Enum):
+        SinglePage = 0
+        MultiPage = 1  # continuous scroll
+
     def __init__(self, parent=None):
         super(PdfView, self).__init__(parent)
 
@@ -81,37 +163,119 @@ class PdfView(QtWidgets.QGraphicsView):
         self._page_navigator = PageNavigator(parent)
         self._zoom_selector = ZoomSelector(parent)
 
+        self.fitzdoc: pymupdf.Document | None = None
         self.page_count: int = 0
         self.page_dlist: pymupdf.DisplayList = None
+        self.page_rects: list[pymupdf.Rect | None] = []
+        self.page_rotations: list[int] = []
+        self.page_rotation_matrices: list[pymupdf.Matrix | None] = []
 
         self.zoom_factor = 1.0
         self.max_zoom_factor = 3.0
         self.min_zoom_factor = 0.5
         self.zoom_factor_step = 0.25
  
-        self.annotations = {}
+        self.annotations: Mapping[int, list] = {}  # pno: search hit quads, drawn over the page
+        self.opened_url_schemes = {"http", "https", "mailto"}  # external links the user may open
+        self._annotated_pages: set[int] = set()
+
+        # Page layout: one page, or placeholders for all pages where only the ones around the viewport are rendered
+        self.page_mode = PdfView.PageMode.SinglePage
+        self.page_spacing = 10
+        self.prefetch_pages = 1  # pages rendered before and after the visible ones
+        self.page_items: dict[int, PageItem] = {}
+        self._page_offsets: list[float] = []  # top of each laid out page in scene coordinates
+        self._layout_pnos: list[int] = []
+        self._layout_zoom: float | None = None
+        self._live_pages: set[int] = set()  # pages holding rendered content
+        self._scrolled_pno: int | None = None  # current page as followed by scrolling
+        self._follow_scroll = True
+
+        # Tiled rendering: pages larger than tile_threshold pixels are rendered by tiles around the viewport
+        self.tiled_rendering = True
+        self.tile_size = 512
+        self.tile_margin = 1  # tiles rendered beyond each edge of the viewport
+        self.tile_threshold = 2048 * 2048
+
+        # Rendered pages and tiles: (pno, zoom, rotation[, tile]) -> (QPixmap, position)
+        self.pixmap_cache = LRUCache(max_bytes=256 * 1024 * 1024, sizeof=lambda rendered: pixmapSize(rendered[0]))
+
+        # Background rendering: document access is serialized by fitz_lock, one worker is enough
+        self.render_pool = QtCore.QThreadPool(self)
+        self.render_pool.setMaxThreadCount(1)
+        self.render_signals = RenderSignals(self)
+        self.render_signals.rendered.connect(self.onRendered)
+        # process results arrive on an executor thread: always handled on the GUI thread
+        self.render_signals.processRendered.connect(self.onRendered, QtCore.Qt.ConnectionType.QueuedConnection)
+        self.render_signals.processFailed.connect(self.onProcessFailed, QtCore.Qt.ConnectionType.QueuedConnection)
+        self._render_ticket: int = 0  # incremented on each layout or zoom change, older jobs are stale
+
+        # Optional multi-process rendering (see setProcessRendering)
+        self.render_backend: ProcessRenderBackend | None = None
+        self._process_jobs: list[tuple[RenderJob, Future]] = []
+
+        # Progressive rendering: a scaled cached render, or a quick render at preview_zoom, shows until the sharp one is ready
+        self.progressive_rendering = True
+        self.preview_zoom = 0.25
+
+        # Pages expected next (see Prefetcher) rendered in background into pixmap_cache
+        self._prefetch_pages: set[int] = set()
+        self._prefetch_pending: set[int] = set()
+
+        # Pages linked from the current one (see LinkGraph) are prefetched too, the nearest first
+        self.link_graph: LinkGraph | None = None
+        self.prefetch_link_targets = 2
+
+        # Display lists of visited pages, the least recently used are dropped beyond the budget
+        self.dlist = LRUCache(max_entries=128, max_bytes=256 * 1024 * 1024)
+
+        # Links followed from the view: hotspots of each page indexed by a BoxGrid, in unrotated page coordinates
+        # so that zooming or relayout keep them valid. Built on the first hover of the page.
+        self.link_factory = LinkFactory()
+        self.link_kinds = [pymupdf.LINK_GOTO, pymupdf.LINK_NAMED, pymupdf.LINK_URI]
+        self.page_links = LRUCache(max_entries=64)  # pno: (links, BoxGrid of their hotspots)
+        self.named_destinations: NamedDestinations | None = None  # targets of the NAMED links once resolved
+        self._hovered_link = None
 
         self.doc_scene = QtWidgets.QGraphicsScene(self)
         self.setScene(self.doc_scene)
 
-        self.page_pixmap_item = self.createPixmapItem()
-        self.doc_scene.addItem(self.page_pixmap_item)
-
         self.setBackgroundBrush(QtGui.QColor(242, 242, 242))
         self.setRenderHint(QtGui.QPainter.RenderHint.Antialiasing)
         self.setRenderHint(QtGui.QPainter.RenderHint.TextAntialiasing)
 
-        self.doc_scene.setSceneRect(self.page_pixmap_item.boundingRect()) 
         self.setAlignment(QtCore.Qt.AlignmentFlag.AlignCenter | QtCore.Qt.AlignmentFlag.AlignHCenter)
+
+        self.horizontalScrollBar().valueChanged.connect(self.onViewportScrolled)
+        self.verticalScrollBar().valueChanged.connect(self.onViewportScrolled)
     
     def showEvent(self, event: QtGui.QShowEvent | None) -> None:
         return super().showEvent(event)
     
+    def resizeEvent(self, event: QtGui.QResizeEvent | None) -> None:
+        super().resizeEvent(event)
+        self.updateVisiblePages()
+
     def setDocument(self, doc: pymupdf.Document):
+        self.cancelRendering()
+        self.render_pool.waitForDone()
+        self.layoutPages([], self._zoom_selector.zoomFactor)
         self.fitzdoc: pymupdf.Document = doc
+        if self.render_backend is not None:
+            self.render_backend.filename = self.fitzdoc.name
+        self.pixmap_cache.clear()
         self._page_navigator.setDocument(self.fitzdoc)
         self.page_count = len(self.fitzdoc)
-        self.dlist: list[pymupdf.DisplayList] = [None] * self.page_count
+        self.dlist.clear()
+        self.page_rects = [None] * self.page_count
+        self.page_rotations = [0] * self.page_count
+        self.page_rotation_matrices = [None] * self.page_count
+        self.page_links.clear()
+        self.link_graph = None
+        self.named_destinations = None
+        self.annotations = {}  # hits of the previous document
+        self._annotated_pages = set()
+        self.setHoveredLink(None)
         self._page_navigator.setCurrentPno(0)
 
     def pageNavigator(self) -> PageNavigator:
@@ -127,8 +291,9 @@ class PdfView(QtWidgets.QGraphicsView):
 
         content_margins = self.contentsMargins()
 
-        page_width = self.dlist[self.pageNavigator().currentPno()].rect.width
-        page_height = self.dlist[self.pageNavigator().currentPno()].rect.height
+        page_rect = self.pageRect(self.pageNavigator().currentPno())
+        page_width = page_rect.width
+        page_height = page_rect.height
         
         if mode == ZoomSelector.ZoomMode.FitToWidth:
             self._zoom_selector.zoomFactor = (view_width - content_margins.left() - content_margins.right() - 20) / page_width
@@ -137,12 +302,27 @@ class PdfView(QtWidgets.QGraphicsView):
             self._zoom_selector.zoomFactor = (view_height - content_margins.bottom() - content_margins.top() -20) / page_height
             self.renderPage(self.pageNavigator().currentPno())
 
+    def setProcessRendering(self, enabled: bool, max_workers: int | None = None):
+        """
+            Render pages in a pool of processes opening the document file, instead of the render thread
+            May be called before a document is set. Not exposed in the UI: for embedding applications.
+        """
+        if self.render_backend is not None:
+            self.cancelRendering()
+            self.render_backend.shutdown()
+            self.render_backend = None
+        if enabled:
+            self.render_backend = ProcessRenderBackend(self.fitzdoc.name if self.fitzdoc is not None else "", max_workers)
+
+    def setPageMode(self, mode: PageMode):
+        self.page_mode = mode
+        self._layout_zoom = None
+        self.renderPage(self.pageNavigator().currentPno())
+
     def toQPixmap(self, fitzpix:pymupdf.Pixmap) -> QtGui.QPixmap:
         """Convert pymupdf.Pixmap to QtGui.QPixmap"""
-        fitzpix_bytes = fitzpix.tobytes()
-        pixmap = QtGui.QPixmap()
-        r = pixmap.loadFromData(fitzpix_bytes)
-        if not r:
+        pixmap = QtGui.QPixmap.fromImage(toQImage(fitzpix))
+        if pixmap.isNull():
             logger.error(f"Cannot load pixmap from data")
         return pixmap
     
@@ -166,50 +346,365 @@ class PdfView(QtWidgets.QGraphicsView):
         fitzpix: pymupdf.Pixmap = page_dlist.get_pixmap(alpha=0, matrix=mat)
         return fitzpix
     
-    def setAnnotations(self, annotations: dict):
-        self.annotations.clear()
-        self.annotations.update(annotations)
-    
-    def renderPage(self, pno=0):
+    def setAnnotations(self, annotations: Mapping[int, list], pages: list[int] | None = None):
+        """
+            Set the search hits to highlight: drawn as an overlay, the document and its rendering are left untouched
+            annotations may be a live view of the hits: it is only read for the pages shown
+            pages: when annotations is the live view already set, the only pages whose hits changed
         """
-            Render the image
-            Convert the pymupdf Displaylist to QPixmap
+        if pages is not None and annotations is self.annotations:
+            changed = set(pages)
+            for pno in changed:
+                if pno in annotations:
+                    self._annotated_pages.add(pno)
+                else:
+                    self._annotated_pages.discard(pno)
+        else:
+            changed = self._annotated_pages | annotations.keys()
+            self.annotations = annotations
+            self._annotated_pages = set(annotations.keys())
+        for pno in changed:
+            item = self.page_items.get(pno)
+            if item is not None:
+                self.updateHighlights(item)
+
+    def updateHighlights(self, item: PageItem):
+        zoom = pymupdf.Matrix(self._layout_zoom, self._layout_zoom)
+        self.pageRect(item.pno)
+        mat = self.page_rotation_matrices[item.pno] * zoom  # quads are in unrotated page coordinates
+
+        polygons = []
+        quad: pymupdf.Quad
+        for quad in self.annotations.get(item.pno, []):
+            quad = pymupdf.Quad(quad) * mat
+            polygons.append(QtGui.QPolygonF([QtCore.QPointF(point.x, point.y) for point in (quad.ul, quad.ur, quad.lr, quad.ll)]))
+        item.setHighlights(polygons)
+
+    def displayList(self, pno: int) -> pymupdf.DisplayList:
+        """
+            Return the display list of page pno, creating it if needed
+            Called from the render worker: fitz_lock must be held
         """
-        page_dlist: pymupdf.DisplayList = self.dlist[pno]
+        page_dlist: pymupdf.DisplayList = self.dlist.get(pno)
 
-        if not page_dlist :  # create if not yet there
+        if page_dlist is None:  # create if not yet there
             fitzpage = self.fitzdoc.load_page(pno)
-            self.dlist[pno] = fitzpage.get_displaylist()
-            page_dlist = self.dlist[pno]
-
-        # Remove annotations
-        page = self.fitzdoc.load_page(pno)
-        self.fitzdoc.xref_set_key(page.xref, "Annots", "null")
-
-        add_annotations = self.annotations.get(pno)
-        if add_annotations is not None:
+            page_dlist = fitzpage.get_displaylist()
+            self.dlist.insert(pno, page_dlist, displayListSize(fitzpage))
+
+        return page_dlist
+
+    def pageRect(self, pno: int) -> pymupdf.Rect:
+        """Return page pno rect (unzoomed) without building its display list"""
+        if self.page_rects[pno] is None:
+            with fitz_lock:
+                fitzpage = self.fitzdoc.load_page(pno)
+                self.page_rects[pno] = fitzpage.rect
+                self.page_rotations[pno] = fitzpage.rotation
+                self.page_rotation_matrices[pno] = fitzpage.rotation_matrix
+        return self.page_rects[pno]
+
+    def renderKey(self, pno: int, zoom_factor: float | None = None) -> tuple:
+        """Return the pixmap_cache key of page pno as currently rendered, at the layout zoom by default"""
+        self.pageRect(pno)
+        if zoom_factor is None:
+            zoom_factor = self._layout_zoom
+        return (pno, zoom_factor, self.page_rotations[pno])
+
+    def cachedPreview(self, pno: int) -> tuple[QtGui.QPixmap, float] | None:
+        """Return the sharpest cached render of page pno at any zoom factor, and its zoom factor"""
+        _, _, rotation = self.renderKey(pno)
+        zoom_factors = [key[1] for key in self.pixmap_cache.keys()
+                        if len(key) == 3 and key[0] == pno and key[2] == rotation]
+        if not zoom_factors:
+            return None
+        zoom_factor = max(zoom_factors)
+        return self.pixmap_cache.peek((pno, zoom_factor, rotation))[0], zoom_factor
+    
+    def renderPage(self, pno=0):
+        """
+            Show page pno at the current zoom factor
+            Pages are rendered in a background worker, placeholders show meanwhile
+        """
+        zoom_factor = self._zoom_selector.zoomFactor
+
+        if self.page_mode == PdfView.PageMode.SinglePage:
+            self.layoutPages([pno], zoom_factor)
+            self.centerOn(self.doc_scene.sceneRect().center())
+        elif zoom_factor != self._layout_zoom or len(self.page_items) != self.page_count:
+            # keep the same relative position in the current page
+            position = 0.0
+            item = self.page_items.get(pno)
+            if item is not None:
+                position = (self.verticalScrollBar().value() - item.y()) / item.rect().height()
+            self.layoutPages(range(self.page_count), zoom_factor)
+            item = self.page_items[pno]
+            self.scrollToScene(item.y() + max(0.0, position) * item.rect().height())
+        elif pno != self._scrolled_pno:
+            self.scrollToScene(self.page_items[pno].y())
+
+        self._scrolled_pno = pno
+        self.setAlignment(QtCore.Qt.AlignmentFlag.AlignHCenter | QtCore.Qt.AlignmentFlag.AlignCenter)
+        self.updateVisiblePages()
+        self.prefetch(pno)
+        self.viewport().update()
 
-            quads: pymupdf.Quad
-            for quads in add_annotations:
-                page.add_highlight_annot(quads)
-            page_dlist = page.get_displaylist()
+    def prefetch(self, pno: int):
+        """Render in background the pages expected after pno, within the prefetcher budget, and the pages it links to"""
+        pnos = self.pageNavigator().prefetcher().pages(pno, self.page_count, self.prefetchCost)
+        if self.link_graph is not None and self.prefetch_link_targets > 0:
+            targets = sorted((target for target in self.link_graph.linksFrom(pno) if target != pno and target not in pnos),
+                             key=lambda target: abs(target - pno))
+            pnos += targets[:self.prefetch_link_targets]
+        self._prefetch_pages = set(pnos)
+        self._prefetch_pending.intersection_update(self._prefetch_pages)
+
+        for pno in pnos:
+            self.prerender(pno)
+
+    def prerender(self, pno: int):
+        """Render page pno in background into the cache, like a prefetched page"""
+        zoom_factor = self.prefetchZoom(pno)
+        self._prefetch_pages.add(pno)
+        if pno in self._live_pages or pno in self._prefetch_pending or self.renderKey(pno, zoom_factor) in self.pixmap_cache:
+            return
+        self._prefetch_pending.add(pno)
+        self.startRenderJob(RenderJob(pno, zoom_factor, self._render_ticket, prefetch=True), priority=-1)
+
+    def prefetchZoom(self, pno: int) -> float:
+        """Return the zoom factor a prefetched page is rendered at: a preview for pages rendered by tiles"""
+        page_rect = self.pageRect(pno) * pymupdf.Matrix(self._layout_zoom, self._layout_zoom)
+        if self.isTiled(QtCore.QRectF(0, 0, page_rect.width, page_rect.height)):
+            return self.preview_zoom
+        return self._layout_zoom
+
+    def prefetchCost(self, pno: int) -> int:
+        """Return the memory taken by page pno once rendered for prefetch"""
+        zoom_factor = self.prefetchZoom(pno)
+        page_rect = self.pageRect(pno) * pymupdf.Matrix(zoom_factor, zoom_factor)
+        return int(page_rect.width * page_rect.height) * 4
+
+    def layoutPages(self, pnos, zoom_factor: float):
+        """Replace the scene pages by placeholders of pages pnos, stacked vertically and centered on x = 0"""
+        if zoom_factor == self._layout_zoom:
+            self.cancelPageRendering()  # e.g. flipping pages: the prefetched ones are still wanted
+        else:
+            self.cancelRendering()
+        for item in self.page_items.values():
+            item.release()
+            self.doc_scene.removeItem(item)
+        self.page_items.clear()
+        self._live_pages.clear()
+        self._page_offsets.clear()
+        self._layout_pnos = list(pnos)
+        self._layout_zoom = zoom_factor
+
+        mat = pymupdf.Matrix(zoom_factor, zoom_factor)
+        y = 0.0
+        width = 0.0
+        for pno in self._layout_pnos:
+            page_rect = self.pageRect(pno) * mat
+            item = PageItem(pno, QtCore.QRectF(0, 0, page_rect.width, page_rect.height))
+            item.setPos(-page_rect.width / 2, y)
+            self.doc_scene.addItem(item)
+            self.page_items[pno] = item
+            self.updateHighlights(item)
+            self._page_offsets.append(y)
+            y += page_rect.height + self.page_spacing
+            width = max(width, page_rect.width)
+
+        self.doc_scene.setSceneRect(QtCore.QRectF(-width / 2, 0, width, max(0.0, y - self.page_spacing)))
+
+    def pageAt(self, position: QtCore.QPointF) -> int | None:
+        """Return the page number at scene position"""
+        i = bisect.bisect_right(self._page_offsets, position.y()) - 1
+        if i < 0:
+            return None
+        item = self.page_items[self._layout_pnos[i]]
+        if item.contains(item.mapFromScene(position)):
+            return item.pno
+        return None
+
+    def updateVisiblePages(self):
+        """Render the pages intersecting the viewport plus prefetch_pages, release the others"""
+        if not self.page_items:
+            return
+
+        visible_rect = self.mapToScene(self.viewport().rect()).boundingRect()
+        first = max(0, bisect.bisect_right(self._page_offsets, visible_rect.top()) - 1)
+        last = max(0, bisect.bisect_right(self._page_offsets, visible_rect.bottom()) - 1)
+        live_pages = set(self._layout_pnos[max(0, first - self.prefetch_pages):last + self.prefetch_pages + 1])
+
+        for pno in self._live_pages.difference(live_pages):
+            self.page_items[pno].release()
+        self._live_pages = live_pages
+
+        for pno in live_pages:
+            self.renderPageItem(self.page_items[pno], visible_rect)
+
+        if self.page_mode == PdfView.PageMode.MultiPage and self._follow_scroll:
+            # current page: the one showing the most
+            pno = max(self._layout_pnos[first:last + 1],
+                      key=lambda pno: self.page_items[pno].sceneBoundingRect().intersected(visible_rect).height())
+            if pno != self.pageNavigator().currentPno():
+                self._scrolled_pno = pno
+                self.pageNavigator().setCurrentPno(pno)
+
+    def renderPageItem(self, item: PageItem, visible_rect: QtCore.QRectF):
+        """Start the render jobs for item: whole page, or tiles intersecting visible_rect plus tile_margin"""
+        zoom_factor = self._layout_zoom
+        render_key = self.renderKey(item.pno)
+        tiled = self.isTiled(item.rect())
+
+        if not item.sharp and item.pixmap_item is None and (tiled or render_key not in self.pixmap_cache):
+            self.showPreview(item)
+
+        if tiled:
+            margin = self.tile_size * self.tile_margin
+            area = item.mapRectFromScene(visible_rect.adjusted(-margin, -margin, margin, margin))
+            wanted = tilesIn(area.intersected(item.rect()), self.tile_size)
+
+            for tile in [tile for tile in item.tiles if tile not in wanted]:
+                item.removeTile(tile)
+            item.pending.intersection_update(wanted | {PREVIEW})
+
+            for tile in wanted.difference(item.tiles, item.pending):
+                cached = self.pixmap_cache.get(render_key + (tile,))
+
+                if cached is None:
+                    item.pending.add(tile)
+                    self.startRenderJob(RenderJob(item.pno, zoom_factor, self._render_ticket, tile, self.tile_size))
+                else:
+                    item.addTile(tile, *cached)
+
+        elif not item.sharp and None not in item.pending:
+            cached = self.pixmap_cache.get(render_key)
+
+            if cached is None:
+                item.pending.add(None)
+                self.startRenderJob(RenderJob(item.pno, zoom_factor, self._render_ticket))
+            else:
+                item.setPixmap(cached[0])
+
+    def showPreview(self, item: PageItem):
+        """Show a scaled cached render of the page, or request a quick low resolution one"""
+        if not self.progressive_rendering:
+            return
+
+        cached = self.cachedPreview(item.pno)
+        if cached is not None:
+            pixmap, zoom_factor = cached
+            item.setPixmap(pixmap, self._layout_zoom / zoom_factor, sharp=False)
+        elif self._layout_zoom > self.preview_zoom and PREVIEW not in item.pending:
+            item.pending.add(PREVIEW)
+            job = RenderJob(item.pno, self.preview_zoom, self._render_ticket, preview=True)
+            self.startRenderJob(job, priority=1)
+
+    def startRenderJob(self, job: RenderJob, priority: int = 0):
+        if self.render_backend is not None:
+            self._process_jobs = [(process_job, future) for process_job, future in self._process_jobs if not future.done()]
+            try:
+                future = self.render_backend.render(job, self.page_rotations[job.pno], self.pageRect(job.pno),
+                                                     self.render_signals.processRendered.emit, self.render_signals.processFailed.emit)
+            except BrokenProcessPool as e:
+                logger.error(f"Cannot render in processes, page {job.pno} is rendered in the thread: {e}")
+            else:
+                self._process_jobs.append((job, future))
+                return
+
+        worker = RenderWorker(job, self.displayList, self.isStale, self.render_signals)
+        self.render_pool.start(worker, priority)
+
+    @Slot(object)
+    def onProcessFailed(self, job: RenderJob):
+        """Render in the thread a job lost by a render process that died"""
+        if not self.isStale(job):
+            self.render_pool.start(RenderWorker(job, self.displayList, self.isStale, self.render_signals))
+
+    def cancelRendering(self):
+        """Drop queued jobs and mark running ones as stale"""
+        self._render_ticket += 1
+        self.render_pool.clear()
+        for _, future in self._process_jobs:
+            future.cancel()
+        self._process_jobs.clear()
+        for item in self.page_items.values():
+            item.pending.clear()
+        self._prefetch_pending.clear()
+
+    def cancelPageRendering(self):
+        """
+            Drop the jobs of the pages laid out, keep the prefetches still expected (see prefetch)
+            For a relayout at the same zoom: queued jobs of pages no longer shown are dropped by isStale when they run.
+        """
+        for job, future in self._process_jobs:
+            if not job.prefetch:
+                future.cancel()
+        self._process_jobs = [(job, future) for job, future in self._process_jobs if job.prefetch and not future.done()]
+        for item in self.page_items.values():
+            item.pending.clear()
+
+    def isStale(self, job: RenderJob) -> bool:
+        """Return True if the job result is no longer wanted. Called from the render worker"""
+        if job.ticket != self._render_ticket:
+            return True
+        if job.prefetch:
+            return job.pno not in self._prefetch_pages
+        item = self.page_items.get(job.pno)
+        return item is None or job.part not in item.pending
+
+    @Slot(object, QtGui.QImage)
+    def onRendered(self, job: RenderJob, image: QtGui.QImage):
+        if job.ticket != self._render_ticket:
+            return
+
+        pixmap = QtGui.QPixmap.fromImage(image)
+        position = QtCore.QPointF(*job.position)
+        # a new ticket is issued on rotation: the current key is the job's key
+        render_key = self.renderKey(job.pno, job.zoom_factor)
+        self.pixmap_cache.insert(render_key if job.tile is None else render_key + (job.tile,), (pixmap, position))
+
+        if job.prefetch:
+            self._prefetch_pending.discard(job.pno)
+            if job.zoom_factor != self._layout_zoom:
+                return
+
+        item = self.page_items.get(job.pno)
+        if item is None or job.part not in item.pending:
+            return
+
+        item.pending.discard(job.part)
+        if job.preview:
+            if not item.sharp:
+                item.setPixmap(pixmap, self._layout_zoom / job.zoom_factor, sharp=False)
+        elif job.tile is None:
+            item.setPixmap(pixmap)
+        else:
+            item.addTile(job.tile, pixmap, position)
 
-        fitzpix = self.createFitzpix(page_dlist, self._zoom_selector.zoomFactor)
-        pixmap = self.toQPixmap(fitzpix)
-        self.page_pixmap_item.setPixmap(pixmap)
+    def isTiled(self, page_rect: QtCore.QRectF) -> bool:
+        """Return True if the page (zoomed rect) is too large to be rendered at once"""
+        if not self.tiled_rendering:
+            return False
+        return page_rect.width() * page_rect.height() > self.tile_threshold
 
-        self.centerOn(self.page_pixmap_item)
-        self.setAlignment(QtCore.Qt.AlignmentFlag.AlignHCenter | QtCore.Qt.AlignmentFlag.AlignCenter)
-        self.doc_scene.setSceneRect(self.page_pixmap_item.boundingRect()) 
-        self.viewport().update()
+    @Slot(int)
+    def onViewportScrolled(self, value: int):
+        self.updateVisiblePages()
 
     def setRotation(self, degree):
         """Rotate current page"""
         pno = self.pageNavigator().currentPno()
-        fitzpage = self.fitzdoc.load_page(pno)
-        rotation = fitzpage.rotation + degree
-        fitzpage.set_rotation(rotation)
-        self.dlist[pno] = fitzpage.get_displaylist()
+        self.cancelRendering()
+        with fitz_lock:
+            fitzpage = self.fitzdoc.load_page(pno)
+            rotation = fitzpage.rotation + degree
+            fitzpage.set_rotation(rotation)
+            self.dlist.insert(pno, fitzpage.get_displaylist(), displayListSize(fitzpage))
+            self.page_rects[pno] = fitzpage.rect
+            self.page_rotations[pno] = fitzpage.rotation
+            self.page_rotation_matrices[pno] = fitzpage.rotation_matrix
+        self._layout_zoom = None
         self.renderPage(pno)
 
     def next(self):
@@ -242,8 +737,10 @@ class PdfView(QtWidgets.QGraphicsView):
             self.setTransformationAnchor(anchor)
             # self.doc_view.centerOn(self.doc_view.mapFromGlobal(pointer_position))
         else:
+            if self.page_mode == PdfView.PageMode.MultiPage:
+                self.verticalScrollBar().setValue(self.verticalScrollBar().sliderPosition() - event.angleDelta().y())
             # Scroll Down
-            if event.angleDelta().y() < 0 and self.verticalScrollBar().sliderPosition() == self.verticalScrollBar().maximum():
+            elif event.angleDelta().y() < 0 and self.verticalScrollBar().sliderPosition() == self.verticalScrollBar().maximum():
                 if self.pageNavigator().currentPno() < self.fitzdoc.page_count - 1:
                     location = QtCore.QPointF()
                     location.setY(self.verticalScrollBar().minimum())
@@ -264,6 +761,13 @@ class PdfView(QtWidgets.QGraphicsView):
     def mousePressEvent(self, event):
         self.a0 = self.mapToScene(event.position().toPoint())
 
+        if (self.mouse_interaction.interaction == MouseInteraction.InteractionType.NONE and
+                event.button() == QtCore.Qt.MouseButton.LeftButton):
+            link = self.linkAt(self.a0)
+            if link is not None:
+                self.followLink(link)
+                return
+
         self.startMouseInteraction()
         self.update()
         # return super().mousePressEvent(event)
@@ -275,6 +779,8 @@ class PdfView(QtWidgets.QGraphicsView):
             r = QtCore.QRectF(self.a0, self.mapToScene(event.position().toPoint())).normalized()
             self._current_graphic_item.setRect(r)
             self.update()
+        elif self.mouse_interaction.interaction == MouseInteraction.InteractionType.NONE:
+            self.setHoveredLink(self.linkAt(self.mapToScene(event.position().toPoint())))
         # return super().mouseMoveEvent(event)
     
     def mouseReleaseEvent(self, event):
@@ -292,17 +798,19 @@ class PdfView(QtWidgets.QGraphicsView):
             self._current_graphic_item.setPen(QtGui.QPen(QtCore.Qt.GlobalColor.red))
             r = QtCore.QRectF(self.a0, self.a0)
             self._current_graphic_item.setRect(r)
-            self._current_graphic_item.pno = self.pageNavigator().currentPno()
+            pno = self.pageAt(self.a0)
+            self._current_graphic_item.pno = pno if pno is not None else self.pageNavigator().currentPno()
             self.doc_scene.addItem(self._current_graphic_item)
 
     def endMouseInteraction(self):
-        self._current_graphic_item.text = self.getSelection(self.pageNavigator().currentPno(), self.a0, self.b1)
+        pno = self._current_graphic_item.pno
+        self._current_graphic_item.text = self.getSelection(pno, self.a0, self.b1)
 
         # save graphics
-        if self._page_navigator.currentPno() in self.graphic_items:
-            self.graphic_items[self._page_navigator.currentPno()].update({id(self._current_graphic_item) : self._current_graphic_item})
+        if pno in self.graphic_items:
+            self.graphic_items[pno].update({id(self._current_graphic_item) : self._current_graphic_item})
         else:
-            self.graphic_items[self._page_navigator.currentPno()] = {id(self._current_graphic_item) : self._current_graphic_item}
+            self.graphic_items[pno] = {id(self._current_graphic_item) : self._current_graphic_item}
 
         self._current_graphic_item = None
 
@@ -321,18 +829,122 @@ class PdfView(QtWidgets.QGraphicsView):
     
     def getSelection(self, pno: int, a0: QtCore.QPointF, b1: QtCore.QPointF) -> TextSelection:
         """Return TextSelection from selection points"""
-        page: pymupdf.Page = self.fitzdoc.load_page(pno)
+        item = self.page_items.get(pno)
+        if item is not None:
+            a0 = item.mapFromScene(a0)
+            b1 = item.mapFromScene(b1)
         zf = self._zoom_selector.zoomFactor
         rect = pymupdf.Rect(a0.x() / zf, a0.y() / zf, b1.x() / zf, b1.y() / zf)
         text_selection = TextSelection()
-        text_selection.text = page.get_textbox(rect)
+        with fitz_lock:
+            page: pymupdf.Page = self.fitzdoc.load_page(pno)
+            text_selection.text = page.get_textbox(rect)
         return text_selection
     
     @Slot(QtCore.QPointF)
     def scrollTo(self, location: QtCore.QPointF | int):
+        """Scroll to location, relative to the top of the current page"""
         if isinstance(location, QtCore.QPointF):
             location = location.toPoint().y()
-        self.verticalScrollBar().setValue(location)
+        item = self.page_items.get(self.pageNavigator().currentPno())
+        self.scrollToScene((item.y() if item is not None else 0) + location)
+
+    def scrollToQuad(self, pno: int, quad: pymupdf.Quad):
+        """Show page pno and center the view on quad (unrotated page coordinates), e.g. a search hit"""
+        self.pageNavigator().jump(pno)
+        item = self.page_items.get(pno)
+        if item is None:
+            return
+
+        mat = self.page_rotation_matrices[pno] * pymupdf.Matrix(self._layout_zoom, self._layout_zoom)
+        rect = (pymupdf.Quad(quad) * mat).rect
+        scene_rect = item.mapRectToScene(QtCore.QRectF(rect.x0, rect.y0, rect.width, rect.height))
+        self._follow_scroll = False
+        self.centerOn(scene_rect.center())
+        self._follow_scroll = True
+
+    def pageLinks(self, pno: int) -> tuple[LinkStore, BoxGrid]:
+        """Return the links of page pno followed from the view and the grid of their hotspots"""
+        page_links = self.page_links.get(pno)
+        if page_links is None:
+            links = LinkStore()
+            with fitz_lock:
+                page: pymupdf.Page = self.fitzdoc.load_page(pno)
+                links.addPage(pno, page.links(self.link_kinds))
+            if self.named_destinations is not None:
+                links.resolveNames(self.named_destinations)
+            page_links = (links, BoxGrid(links.hotspots))
+            self.page_links.insert(pno, page_links)
+        return page_links
+
+    def linkAt(self, position: QtCore.QPointF) -> GoToLink | NamedLink | UriLink | None:
+        """Return the link at scene position"""
+        pno = self.pageAt(position)
+        if pno is None:
+            return None
+
+        point = self.page_items[pno].mapFromScene(position)
+        self.pageRect(pno)
+        mat = ~(self.page_rotation_matrices[pno] * pymupdf.Matrix(self._layout_zoom, self._layout_zoom))
+        point = pymupdf.Point(point.x(), point.y()) * mat
+
+        links, grid = self.pageLinks(pno)
+        found = grid.query(pymupdf.Rect(point, point))
+        return self.link_factory.createLink(links, found[-1]) if found else None  # the last one drawn is on top
+
+    def setHoveredLink(self, link: GoToLink | NamedLink | UriLink | None):
+        if link == self._hovered_link:
+            return
+        self._hovered_link = link
+        if link is None:
+            self.viewport().unsetCursor()
+            self.setToolTip("")
+        else:
+            self.viewport().setCursor(QtCore.Qt.CursorShape.PointingHandCursor)
+            self.setToolTip(link.uri if isinstance(link, UriLink) else "")
+
+    def setNamedDestinations(self, destinations: NamedDestinations | None):
+        self.named_destinations = destinations
+        self.page_links.clear()
+        self.setHoveredLink(None)
+
+    def followLink(self, link: GoToLink | NamedLink | UriLink):
+        """Jump to the target of an internal link, open an external one once confirmed"""
+        if isinstance(link, UriLink):
+            url = QtCore.QUrl(link.uri)
+            if self.confirmUrl(url):
+                QtGui.QDesktopServices.openUrl(url)
+            return
+        self.jumpTo(link.page_to, link.to)
+
+    def confirmUrl(self, url: QtCore.QUrl) -> bool:
+        """
+            Show the target of an external link before opening it
+            Documents are not trusted: only web and mail links are opened, other schemes may start any registered handler
+        """
+        if url.scheme().lower() not in self.opened_url_schemes:
+            logger.warning(f"Link not opened: {url.toString()}")
+            QtWidgets.QMessageBox.warning(self, "External link", f"This link is not opened:\n\n{url.toString()}")
+            return False
+        answer = QtWidgets.QMessageBox.question(self, "External link", f"Open this link?\n\n{url.toString()}")
+        return answer == QtWidgets.QMessageBox.StandardButton.Yes
+
+    def jumpTo(self, pno: int, to: pymupdf.Point | None = None):
+        """Show page pno, scrolled to point to (unrotated page coordinates) if given"""
+        if not 0 <= pno < self.page_count:
+            return
+        location = QtCore.QPointF()
+        if to is not None and self._layout_zoom is not None:
+            self.pageRect(pno)
+            to = pymupdf.Point(to) * self.page_rotation_matrices[pno] * self._layout_zoom
+            location = QtCore.QPointF(to.x, to.y)
+        self.pageNavigator().jump(pno, location)
+
+    def scrollToScene(self, y: float):
+        """Set the vertical scroll position without changing the current page"""
+        self._follow_scroll = False
+        self.verticalScrollBar().setValue(int(y))
+        self._follow_scroll = True
 
 
 class PdfViewer(QtWidgets.QWidget):
@@ -347,10 +959,22 @@ class PdfViewer(QtWidgets.QWidget):
             self.fitzdoc: pymupdf.Document = pymupdf.Document(self.pdfdocument.fileName())
             self.pdfview.setDocument(self.fitzdoc)
             self.outline_model.setDocument(self.fitzdoc)
+            self.keyword_model.setDocument(self.fitzdoc)  # stopped first: it fills the page words of search_model
             self.search_model.setDocument(self.fitzdoc)
-            # self.link_model.setDocument(self.fitzdoc)  # Performance issue
+            self.link_model.setDocument(self.fitzdoc)
             self.metadata_tab.setMetadata(self.fitzdoc.metadata)
 
+    def closeEvent(self, event: QtGui.QCloseEvent):
+        self.shutdown()
+        super().closeEvent(event)
+
+    @Slot()
+    def shutdown(self):
+        """Stop the process pools (library indexing, search, rendering): they would outlive the window"""
+        self.library_model.library().shutdown()
+        self.search_model.shutdown()
+        self.pdfview.setProcessRendering(False)
+
     def initViewer(self):
         self.fold = False
         vbox = QtWidgets.QVBoxLayout()
@@ -362,6 +986,8 @@ class PdfViewer(QtWidgets.QWidget):
         self.outline_model = OutlineModel()
         self.link_model = LinkModel()
         self.search_model = SearchModel()
+        self.library_model = LibraryModel(Library(parent=self))
+        self.keyword_model = KeywordModel(self.search_model)
 
         # Toolbar button
         self.mouse_action_group = QtGui.QActionGroup(self)
@@ -406,6 +1032,12 @@ class PdfViewer(QtWidgets.QWidget):
         self.rotate_clockwise.setToolTip("Rotate clockwise")
         self.rotate_clockwise.triggered.connect(lambda: self.pdfview.setRotation(90))
 
+        # Page mode
+        self.continuous_scroll = QtGui.QAction(QtGui.QIcon(":stack-line"), "Continuous", self)
+        self.continuous_scroll.setToolTip("Continuous scroll")
+        self.continuous_scroll.setCheckable(True)
+        self.continuous_scroll.toggled.connect(self.onContinuousScrollToggled)
+
         # Collapse Left pane
         self.fold_left_pane = QtGui.QAction(QtGui.QIcon(':sidebar-fold-line'), "", self, triggered=self.onFoldLeftSidebarTriggered)
 
@@ -417,6 +1049,7 @@ class PdfViewer(QtWidgets.QWidget):
         self._toolbar.addAction(self.action_fitheight)
         self._toolbar.addAction(self.rotate_anticlockwise)
         self._toolbar.addAction(self.rotate_clockwise)
+        self._toolbar.addAction(self.continuous_scroll)
         self._toolbar.add_spacer()
         self._toolbar.addAction(self.text_selector)
         self._toolbar.addAction(self.capture_area)
@@ -440,8 +1073,25 @@ class PdfViewer(QtWidgets.QWidget):
         self.link_tab = QtWidgets.QTreeView(self.left_pane)
         self.link_tab.setModel(self.link_model)
         self.link_tab.setHeaderHidden(True)
+        self.link_tab.setUniformRowHeights(True)  # only the rows shown are labelled
         self.link_tab.selectionModel().selectionChanged.connect(self.onLinkSelected)
-        self.left_pane.addTab(self.link_tab, "Links")
+
+        # Pages linking to the current one
+        self.backlinks = QtWidgets.QListWidget(self.left_pane)
+        self.backlinks.itemClicked.connect(self.onBacklinkClicked)
+        self.backlinks_label = QtWidgets.QLabel("Referenced from")
+
+        backlinks_widget = QtWidgets.QWidget(self.left_pane)
+        backlinks_layout = QtWidgets.QVBoxLayout()
+        backlinks_layout.setContentsMargins(0, 0, 0, 0)
+        backlinks_widget.setLayout(backlinks_layout)
+        backlinks_layout.addWidget(self.backlinks_label)
+        backlinks_layout.addWidget(self.backlinks)
+
+        link_splitter = QtWidgets.QSplitter(QtCore.Qt.Orientation.Vertical, self.left_pane)
+        link_splitter.addWidget(self.link_tab)
+        link_splitter.addWidget(backlinks_widget)
+        self.left_pane.addTab(link_splitter, "Links")
 
         # Search Tab
         search_tab = QtWidgets.QWidget(self.left_pane)
@@ -451,20 +1101,107 @@ class PdfViewer(QtWidgets.QWidget):
         self.search_LineEdit = QtWidgets.QLineEdit()
         self.search_LineEdit.setPlaceholderText("Find in document")
         self.search_LineEdit.editingFinished.connect(self.searchFor)
+
+        # Search as you type, once typing pauses
+        self.search_timer = QtCore.QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(250)
+        self.search_timer.timeout.connect(self.searchFor)
+        self.search_LineEdit.textEdited.connect(lambda: self.search_timer.start())
         
         self.search_count = QtWidgets.QLabel("Hits: ")
 
-        self.search_results = QtWidgets.QTreeView(self.left_pane)
+        self.search_options = QtWidgets.QToolBar(search_tab)
+        self.search_case_sensitive = self.search_options.addAction("Aa")
+        self.search_case_sensitive.setToolTip("Match case")
+        self.search_whole_word = self.search_options.addAction("W")
+        self.search_whole_word.setToolTip("Match whole word")
+        self.previous_hit = QtGui.QAction(QtGui.QIcon(':arrow-up-s-line'), "Previous hit", self)
+        self.previous_hit.setShortcut(QtGui.QKeySequence("shift+F3"))
+        self.previous_hit.triggered.connect(self.previousHit)
+        self.next_hit = QtGui.QAction(QtGui.QIcon(':arrow-down-s-line'), "Next hit", self)
+        self.next_hit.setShortcut(QtGui.QKeySequence("F3"))
+        self.next_hit.triggered.connect(self.nextHit)
+        self.search_options.addAction(self.previous_hit)
+        self.search_options.addAction(self.next_hit)
+        self.addActions([self.previous_hit, self.next_hit])  # shortcuts work with the left pane folded
+        self.search_options.addSeparator()
+        self.search_regex = self.search_options.addAction(".*")
+        self.search_regex.setToolTip("Regular expression\nOtherwise terms separated by | are searched at once")
+        for action in (self.search_case_sensitive, self.search_whole_word, self.search_regex):
+            action.setCheckable(True)
+            action.toggled.connect(self.searchFor)
+
+        # QListView only fetches the hits scrolled to and lays out rows of one height
+        self.search_results = QtWidgets.QListView(self.left_pane)
         self.search_results.setModel(self.search_model)
-        self.search_results.setHeaderHidden(True)
-        self.search_results.setRootIsDecorated(False)
+        self.search_results.setUniformItemSizes(True)
         self.search_results.selectionModel().selectionChanged.connect(self.onSearchResultSelected)
 
         search_tab_layout.addWidget(self.search_LineEdit)
+        search_tab_layout.addWidget(self.search_options)
         search_tab_layout.addWidget(self.search_count)
         search_tab_layout.addWidget(self.search_results)
         self.left_pane.addTab(search_tab, "Search")
 
+        # Library Tab: search a folder of documents
+        library_tab = QtWidgets.QWidget(self.left_pane)
+        library_tab_layout = QtWidgets.QVBoxLayout()
+        library_tab.setLayout(library_tab_layout)
+
+        self.library_toolbar = QtWidgets.QToolBar(library_tab)
+        self.open_library = self.library_toolbar.addAction(QtGui.QIcon(':folder-open-line'), "Open folder")
+        self.open_library.triggered.connect(self.onOpenLibraryTriggered)
+
+        self.library_LineEdit = QtWidgets.QLineEdit()
+        self.library_LineEdit.setPlaceholderText("Find in folder")
+        self.library_LineEdit.editingFinished.connect(self.searchLibrary)
+
+        self.library_status = QtWidgets.QLabel(self.library_model.statusText())
+
+        self.library_results = QtWidgets.QTreeView(self.left_pane)
+        self.library_results.setModel(self.library_model)
+        self.library_results.setHeaderHidden(True)
+        self.library_results.selectionModel().selectionChanged.connect(self.onLibraryResultSelected)
+
+        library_tab_layout.addWidget(self.library_toolbar)
+        library_tab_layout.addWidget(self.library_LineEdit)
+        library_tab_layout.addWidget(self.library_status)
+        library_tab_layout.addWidget(self.library_results)
+        self.left_pane.addTab(library_tab, "Library")
+
+        # Keywords Tab: search a list of terms at once
+        keyword_tab = QtWidgets.QWidget(self.left_pane)
+        keyword_tab_layout = QtWidgets.QVBoxLayout()
+        keyword_tab.setLayout(keyword_tab_layout)
+
+        self.keyword_toolbar = QtWidgets.QToolBar(keyword_tab)
+        self.load_keywords = self.keyword_toolbar.addAction(QtGui.QIcon(':folder-open-line'), "Load keyword list")
+        self.load_keywords.triggered.connect(self.onLoadKeywordsTriggered)
+        self.search_keywords = self.keyword_toolbar.addAction(QtGui.QIcon(':search-line'), "Search keywords")
+        self.search_keywords.triggered.connect(self.searchKeywords)
+        self.export_keywords = self.keyword_toolbar.addAction(QtGui.QIcon(':share-forward-2-line'), "Export hits")
+        self.export_keywords.triggered.connect(self.onExportKeywordsTriggered)
+
+        self.keyword_list = QtWidgets.QPlainTextEdit(keyword_tab)
+        self.keyword_list.setPlaceholderText("One term per line")
+
+        self.keyword_status = QtWidgets.QLabel(self.keyword_model.statusText())
+
+        self.keyword_results = QtWidgets.QTreeView(self.left_pane)
+        self.keyword_results.setModel(self.keyword_model)
+        self.keyword_results.setHeaderHidden(True)
+        self.keyword_results.selectionModel().selectionChanged.connect(self.onKeywordResultSelected)
+
+        keyword_splitter = QtWidgets.QSplitter(QtCore.Qt.Orientation.Vertical, keyword_tab)
+        keyword_splitter.addWidget(self.keyword_list)
+        keyword_splitter.addWidget(self.keyword_results)
+
+        keyword_tab_layout.addWidget(self.keyword_toolbar)
+        keyword_tab_layout.addWidget(self.keyword_status)
+        keyword_tab_layout.addWidget(keyword_splitter)
+        self.left_pane.addTab(keyword_tab, "Keywords")
+
         # Metadata
         self.metadata_tab = MetaDataWidget(self.left_pane)
         self.left_pane.addTab(self.metadata_tab, "Metadata")
@@ -483,9 +1220,16 @@ class PdfViewer(QtWidgets.QWidget):
         # Signals
         self.page_navigator.currentPnoChanged.connect(self.pdfview.renderPage)
         self.page_navigator.currentLocationChanged.connect(self.pdfview.scrollTo)
+        self.page_navigator.currentPnoChanged.connect(self.updateBacklinks)
+        self.link_model.sigLinkGraphChanged.connect(self.onLinkGraphChanged)
+        self.link_model.sigNamedDestinationsChanged.connect(self.onNamedDestinationsChanged)
         self.search_model.sigTextFound.connect(self.onSearchFound)
+        self.search_model.sigHitsChanged.connect(self.onSearchHitsChanged)
+        self.library_model.sigStatusChanged.connect(self.library_status.setText)
+        self.keyword_model.sigStatusChanged.connect(self.keyword_status.setText)
 
         self.installEventFilter(self.pdfview)
+        QtWidgets.QApplication.instance().aboutToQuit.connect(self.shutdown)
 
         # Collapse Left Side pane by default
         self.onFoldLeftSidebarTriggered()
@@ -505,9 +1249,10 @@ class PdfViewer(QtWidgets.QWidget):
     @Slot(str)
     def onSearchFound(self, count: str):
         self.search_count.setText(count)
-        self.pdfview.setAnnotations(self.search_model.getSearchResults())
-        self.pdfview.renderPage(self.page_navigator.currentPno())
-        self.search_results.resizeColumnToContents(0)
+
+    @Slot(list)
+    def onSearchHitsChanged(self, pages: list):
+        self.pdfview.setAnnotations(self.search_model.getSearchResults(), pages)
 
     def pdfViewSize(self) -> QtCore.QSize:
         idx = self.splitter.indexOf(self.pdfview)
@@ -528,8 +1273,90 @@ class PdfViewer(QtWidgets.QWidget):
     
     @Slot()
     def searchFor(self):
-        self.search_model.searchFor(self.search_LineEdit.text())
+        self.search_timer.stop()
+        self.search_model.searchFor(self.search_LineEdit.text(),
+                                    case_sensitive=self.search_case_sensitive.isChecked(),
+                                    whole_word=self.search_whole_word.isChecked(),
+                                    regex=self.search_regex.isChecked())
     
+    @Slot()
+    def onOpenLibraryTriggered(self):
+        directory = QtWidgets.QFileDialog.getExistingDirectory(self, "Open folder", self.library_model.library().directory)
+        if directory:
+            self.library_model.library().setDirectory(directory)
+
+    @Slot()
+    def searchLibrary(self):
+        self.library_model.searchFor(self.library_LineEdit.text(),
+                                     case_sensitive=self.search_case_sensitive.isChecked(),
+                                     whole_word=self.search_whole_word.isChecked(),
+                                     regex=self.search_regex.isChecked())
+
+    @Slot()
+    def onLoadKeywordsTriggered(self):
+        filename, _ = QtWidgets.QFileDialog.getOpenFileName(self, "Load keyword list", "", "Text files (*.txt);;All files (*)")
+        if filename:
+            self.keyword_list.setPlainText("\n".join(readKeywords(filename)))
+            self.searchKeywords()
+
+    @Slot()
+    def searchKeywords(self):
+        self.keyword_model.searchKeywords(self.keyword_list.toPlainText().splitlines(),
+                                          case_sensitive=self.search_case_sensitive.isChecked(),
+                                          whole_word=self.search_whole_word.isChecked())
+
+    @Slot()
+    def onExportKeywordsTriggered(self):
+        filename, _ = QtWidgets.QFileDialog.getSaveFileName(self, "Export hits", "", "CSV (*.csv);;JSON (*.json)")
+        if not filename:
+            return
+        if filename.lower().endswith(".json"):
+            self.keyword_model.results().exportJson(filename, self.fitzdoc.name)
+        else:
+            self.keyword_model.results().exportCsv(filename)
+
+    def openLibraryHit(self, filename: str, pno: int | None):
+        """Load filename if not open, show the hits of the library query in it and jump to page pno"""
+        if not hasattr(self, "fitzdoc") or os.path.abspath(self.fitzdoc.name) != os.path.abspath(filename):
+            self.loadDocument(QtCore.QFile(filename))
+
+        query = self.library_model.query()
+        if query is not None:
+            for action, checked in ((self.search_case_sensitive, query.case_sensitive),
+                                    (self.search_whole_word, query.whole_word),
+                                    (self.search_regex, query.regex)):
+                action.blockSignals(True)
+                action.setChecked(checked)
+                action.blockSignals(False)
+            self.search_LineEdit.setText(query.text)
+            self.searchFor()
+
+        if pno is not None:
+            self.page_navigator.jump(pno)
+
+    @Slot()
+    def nextHit(self):
+        row = self.search_results.currentIndex().row()
+        if row < 0:
+            row = self.search_model.hitFrom(self.page_navigator.currentPno())
+        else:
+            row += 1
+        self.showHit(row % max(self.search_model.foundCount(), 1))
+
+    @Slot()
+    def previousHit(self):
+        row = self.search_results.currentIndex().row()
+        if row < 0:
+            row = self.search_model.hitFrom(self.page_navigator.currentPno())
+        self.showHit((row - 1) % max(self.search_model.foundCount(), 1))
+
+    def showHit(self, row: int):
+        """Select hit row: the view scrolls to it"""
+        if not 0 <= row < self.search_model.foundCount():
+            return
+        self.search_model.fetchTo(row)
+        self.search_results.setCurrentIndex(self.search_model.index(row))
+
     @Slot()
     def fitwidth(self):
         self.pdfview.setZoomMode(ZoomSelector.ZoomMode.FitToWidth)
@@ -538,12 +1365,47 @@ class PdfViewer(QtWidgets.QWidget):
     def fitheight(self):
         self.pdfview.setZoomMode(ZoomSelector.ZoomMode.FitInView)
     
+    @Slot(bool)
+    def onContinuousScrollToggled(self, checked: bool):
+        self.pdfview.setPageMode(PdfView.PageMode.MultiPage if checked else PdfView.PageMode.SinglePage)
+
     @Slot(QtCore.QItemSelection, QtCore.QItemSelection)
     def onOutlineSelected(self, selected: QtCore.QItemSelection, deseleted: QtCore.QItemSelection):
         for idx in selected.indexes():
             item: OutlineItem = self.outline_tab.model().itemFromIndex(idx)
             if item.details is not None:
-                self.page_navigator.jump(item.page)
+                self.pdfview.jumpTo(*self.outline_model.destination(item))
+
+    @Slot()
+    def onNamedDestinationsChanged(self):
+        destinations = self.link_model.namedDestinations()
+        self.pdfview.setNamedDestinations(destinations)
+        self.outline_model.setNamedDestinations(destinations)
+
+    @Slot()
+    def onLinkGraphChanged(self):
+        self.pdfview.link_graph = self.link_model.linkGraph()
+        self.updateBacklinks()
+
+    @Slot()
+    def updateBacklinks(self):
+        """List the pages linking to the current page"""
+        self.backlinks.clear()
+        graph = self.link_model.linkGraph()
+        pno = self.page_navigator.currentPno()
+        if graph is None or pno is None:
+            self.backlinks_label.setText("Referenced from")
+            return
+
+        self.backlinks_label.setText(f"Referenced from ({self.page_navigator.pageLabel(pno)})")
+        for source in graph.linksTo(pno):
+            item = QtWidgets.QListWidgetItem(f"p. {self.page_navigator.pageLabel(source)}")
+            item.setData(QtCore.Qt.ItemDataRole.UserRole, source)
+            self.backlinks.addItem(item)
+
+    @Slot(QtWidgets.QListWidgetItem)
+    def onBacklinkClicked(self, item: QtWidgets.QListWidgetItem):
+        self.page_navigator.jump(item.data(QtCore.Qt.ItemDataRole.UserRole))
 
     @Slot(QtCore.QItemSelection, QtCore.QItemSelection)
     def onLinkSelected(self, selected: QtCore.QItemSelection, deseleted: QtCore.QItemSelection):
@@ -551,14 +1413,35 @@ class PdfViewer(QtWidgets.QWidget):
             item: LinkItem = self.link_tab.model().itemFromIndex(idx)
             link = item.link()
             if isinstance(link, (GoToLink, NamedLink)):
-                self.page_navigator.jump(link.page_to)
+                self.pdfview.followLink(link)
 
     @Slot(QtCore.QItemSelection, QtCore.QItemSelection)
     def onSearchResultSelected(self, selected: QtCore.QItemSelection, deseleted: QtCore.QItemSelection):
         for idx in selected.indexes():
-            item: SearchItem = self.search_results.model().itemFromIndex(idx)
-            page, quads, page_label = item.results()
-            self.page_navigator.jump(page)
+            page, quad, page_label = self.search_model.hit(idx.row())
+            self.pdfview.scrollToQuad(page, quad)
+
+            # the pages of the neighbour hits are likely shown next
+            for row in (idx.row() - 1, idx.row() + 1):
+                if 0 <= row < self.search_model.foundCount() and self.search_model.hit(row)[0] != page:
+                    self.pdfview.prerender(self.search_model.hit(row)[0])
+
+    @Slot(QtCore.QItemSelection, QtCore.QItemSelection)
+    def onLibraryResultSelected(self, selected: QtCore.QItemSelection, deseleted: QtCore.QItemSelection):
+        for idx in selected.indexes():
+            item: LibraryItem = self.library_model.itemFromIndex(idx)
+            filename, pno, page_label = item.results()
+            self.openLibraryHit(filename, pno)
+
+    @Slot(QtCore.QItemSelection, QtCore.QItemSelection)
+    def onKeywordResultSelected(self, selected: QtCore.QItemSelection, deseleted: QtCore.QItemSelection):
+        for idx in selected.indexes():
+            item: KeywordItem = self.keyword_model.itemFromIndex(idx)
+            hits = self.keyword_model.termHits(item.term)
+            self.pdfview.setAnnotations(hits)
+            pno = item.pno if item.pno is not None else min(hits, default=None)
+            if pno is not None:
+                self.page_navigator.jump(pno)
 
     @Slot()
     def onFoldLeftSidebarTriggered(self):
@@ -0,0 +1,234 @@
+import math
+import pymupdf
+import logging
+import threading
+
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from multiprocessing import get_context, shared_memory
+from typing import Callable
+
+from PyQt6 import QtCore, QtGui
+from PyQt6.QtCore import pyqtSignal as Signal
+
+
+logger = logging.getLogger(__name__)
+
+# PyMuPDF is not thread-safe: any access to a document shared with a worker thread must hold this lock
+fitz_lock = threading.RLock()
+
+
+QIMAGE_FORMATS = {
+    (1, False): QtGui.QImage.Format.Format_Grayscale8,
+    (3, False): QtGui.QImage.Format.Format_RGB888,
+    (4, True): QtGui.QImage.Format.Format_RGBA8888_Premultiplied,
+}
+
+
+def toQImage(fitzpix: pymupdf.Pixmap) -> QtGui.QImage:
+    """
+        Wrap the samples of a pymupdf.Pixmap in a QtGui.QImage
+
+        No PNG encoding/decoding and no copy: the image reads pix.samples_mv directly.
+        The image holds a reference to the pixmap so the buffer lives as long as the image.
+        Use QImage.copy() when the image must outlive the wrapper (e.g. across threads).
+    """
+    if fitzpix.colorspace is None or fitzpix.colorspace.n not in (1, 3) or (fitzpix.colorspace.n == 1 and fitzpix.alpha):
+        # CMYK, gray + alpha, stencil masks...
+        fitzpix = pymupdf.Pixmap(pymupdf.csRGB, fitzpix)
+
+    image_format = QIMAGE_FORMATS[(fitzpix.n, bool(fitzpix.alpha))]
+    image = QtGui.QImage(fitzpix.samples_mv, fitzpix.width, fitzpix.height, fitzpix.stride, image_format)
+    image._fitzpix = fitzpix  # keep the backing buffer alive
+    return image
+
+
+def tileClip(tile: tuple[int, int], tile_size: int, zoom_factor: float) -> pymupdf.Rect:
+    """Return the page area (unzoomed coordinates) covered by tile (column, row)"""
+    column, row = tile
+    size = tile_size / zoom_factor
+    return pymupdf.Rect(column * size, row * size, (column + 1) * size, (row + 1) * size)
+
+
+def tilesIn(rect, tile_size: int) -> set[tuple[int, int]]:
+    """Return the tiles (column, row) intersecting rect (zoomed coordinates)"""
+    if rect.isEmpty():
+        return set()
+    columns = range(int(rect.left() // tile_size), int(rect.right() // tile_size) + 1)
+    rows = range(int(rect.top() // tile_size), int(rect.bottom() // tile_size) + 1)
+    return {(column, row) for column in columns for row in rows}
+
+
+PREVIEW = "preview"
+
+
+@dataclass
+class RenderJob:
+    pno: int
+    zoom_factor: float
+    ticket: int = 0
+    tile: tuple[int, int] | None = None  # None: whole page
+    tile_size: int = 0
+    preview: bool = False  # quick low resolution render shown until the sharp one is ready
+    prefetch: bool = False  # page expected to be shown soon, rendered into the cache only
+    position: tuple[int, int] = (0, 0)  # top-left corner of the rendered pixmap, set by the worker
+
+    @property
+    def part(self) -> tuple[int, int] | str | None:
+        """Part of the page rendered: a tile, PREVIEW, or None for the whole page"""
+        return PREVIEW if self.preview else self.tile
+
+
+class RenderSignals(QtCore.QObject):
+    rendered = Signal(object, QtGui.QImage)  # RenderJob, image
+    processRendered = Signal(object, QtGui.QImage)  # RenderJob, image; emitted from a ProcessRenderBackend pool thread
+    processFailed = Signal(object)  # RenderJob lost by a ProcessRenderBackend process that died; from a pool thread
+
+
+class RenderWorker(QtCore.QRunnable):
+    """
+        Build the page display list and rasterize it off the GUI thread
+
+        The result is delivered by signals.rendered as a QImage owning its data (QPixmap cannot be created outside the GUI thread).
+        Stale jobs (page or zoom changed meanwhile) are dropped between each step.
+    """
+    def __init__(self, job: RenderJob, display_list: Callable[[int], pymupdf.DisplayList], is_stale: Callable[[RenderJob], bool], signals: RenderSignals):
+        super().__init__()
+        self.job = job
+        self.display_list = display_list
+        self.is_stale = is_stale
+        self.signals = signals
+
+    def run(self):
+        job = self.job
+
+        with fitz_lock:
+            if self.is_stale(job):
+                return
+            page_dlist = self.display_list(job.pno)
+
+        # a display list does not touch the document: it is rasterized without holding the lock,
+        # GUI thread calls (page rects, text, links) do not wait for the render
+        if self.is_stale(job):
+            return
+        mat = pymupdf.Matrix(job.zoom_factor, job.zoom_factor)
+        if job.tile is None:
+            fitzpix: pymupdf.Pixmap = page_dlist.get_pixmap(alpha=0, matrix=mat)
+        else:
+            clip = tileClip(job.tile, job.tile_size, job.zoom_factor) & page_dlist.rect
+            if clip.is_empty:
+                return
+            fitzpix: pymupdf.Pixmap = page_dlist.get_pixmap(alpha=0, matrix=mat, clip=clip)
+
+        if self.is_stale(job):
+            return
+        job.position = (fitzpix.x, fitzpix.y)
+        self.signals.rendered.emit(job, toQImage(fitzpix).copy())
+
+
+_process_documents: dict[str, pymupdf.Document] = {}  # documents opened by a render process
+
+
+def processRender(filename: str, pno: int, zoom_factor: float, rotation: int, clip: tuple | None, shm_name: str) -> tuple:
+    """
+        Process pool worker: rasterize page pno of filename into the shared memory block shm_name
+        Return the pixmap geometry (width, height, stride, x, y)
+    """
+    doc = _process_documents.get(filename)
+    if doc is None:
+        doc = _process_documents[filename] = pymupdf.Document(filename)
+
+    page = doc.load_page(pno)
+    if page.rotation != rotation:
+        page.set_rotation(rotation)
+    mat = pymupdf.Matrix(zoom_factor, zoom_factor)
+    fitzpix: pymupdf.Pixmap = page.get_pixmap(alpha=False, matrix=mat, clip=clip)
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        samples = fitzpix.samples_mv
+        if len(samples) > shm.size:
+            raise ValueError(f"page {pno}: {len(samples)} bytes do not fit in {shm.size}")
+        shm.buf[:len(samples)] = samples
+        del samples
+    finally:
+        shm.close()
+
+    return fitzpix.width, fitzpix.height, fitzpix.stride, fitzpix.x, fitzpix.y
+
+
+class ProcessRenderBackend:
+    """
+        Optional render backend: a pool of processes, each opening the document by filename
+
+        The GIL and PyMuPDF thread rules do not apply across processes: pages render in parallel on all cores.
+        The parent allocates a shared memory block per job, large enough for the pixmap, and the worker fills it:
+        pixels are never pickled. The block is released once copied into a QImage.
+        A pool broken by a process that died is replaced on the next render.
+    """
+    def __init__(self, filename: str, max_workers: int | None = None):
+        self.filename = filename
+        self.max_workers = max_workers
+        self.executor = self.createExecutor()
+
+    def createExecutor(self) -> ProcessPoolExecutor:
+        # spawn: forking a process running Qt threads is unsafe
+        return ProcessPoolExecutor(self.max_workers, mp_context=get_context("spawn"))
+
+    def submit(self, *args) -> Future:
+        """Submit processRender(*args), to a new pool if a process of the current one died"""
+        try:
+            return self.executor.submit(processRender, *args)
+        except BrokenProcessPool:
+            logger.warning("A render process died, starting new ones")
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = self.createExecutor()
+            return self.executor.submit(processRender, *args)
+
+    def render(self, job: RenderJob, rotation: int, page_rect: pymupdf.Rect, callback: Callable[[RenderJob, QtGui.QImage], None],
+               failed: Callable[[RenderJob], None] | None = None) -> Future:
+        """
+            Render job in a worker process, page_rect being the page rect at rotation
+            callback(job, image) is called from a pool thread when done, failed(job) if the process died meanwhile
+            Raise BrokenProcessPool if the processes cannot be started again.
+        """
+        clip = None
+        area = page_rect
+        if job.tile is not None:
+            clip = tileClip(job.tile, job.tile_size, job.zoom_factor) & page_rect
+            area = clip
+        area = area * pymupdf.Matrix(job.zoom_factor, job.zoom_factor)
+        size = (math.ceil(area.width) + 2) * (math.ceil(area.height) + 2) * 3
+
+        shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        try:
+            future = self.submit(self.filename, job.pno, job.zoom_factor, rotation, None if clip is None else tuple(clip), shm.name)
+        except BaseException:
+            shm.close()
+            shm.unlink()
+            raise
+        future.add_done_callback(lambda future: self._finished(future, shm, job, callback, failed))
+        return future
+
+    def _finished(self, future: Future, shm: shared_memory.SharedMemory, job: RenderJob, callback: Callable, failed: Callable | None):
+        try:
+            if future.cancelled():
+                return
+            if future.exception() is not None:
+                logger.error(f"Cannot render page {job.pno}: {future.exception()}")
+                if isinstance(future.exception(), BrokenProcessPool) and failed is not None:
+                    failed(job)
+                return
+            width, height, stride, x, y = future.result()
+            view = QtGui.QImage(shm.buf, width, height, stride, QtGui.QImage.Format.Format_RGB888)
+            image = view.copy()
+            del view
+            job.position = (x, y)
+            callback(job, image)
+        finally:
+            shm.close()
+            shm.unlink()
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,583 @@
+import re
+import bisect
+import pymupdf
+import sqlite3
+import logging
+
+from array import array
+from collections.abc import Mapping
+from concurrent.futures import Executor, Future, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from typing import Callable
+
+from PyQt6 import QtCore
+from PyQt6.QtCore import pyqtSignal as Signal
+
+from cache import LRUCache
+from render import fitz_lock
+from sidecar import Sidecar
+
+logger = logging.getLogger(__name__)
+
+
+def fold(text: str) -> str:
+    """Lower case text keeping its length, so that offsets still match the original"""
+    lowered = text.lower()
+    if len(lowered) == len(text):
+        return lowered
+    return "".join(c.lower()[0] for c in text)
+
+
+@dataclass(frozen=True)
+class SearchQuery:
+    """
+        What to search for
+
+        Terms separated by "|" are searched at once. A single literal term, case-insensitive, is a plain query:
+        the one page.search_for answers. Other queries are matched by a regular expression against the page words.
+    """
+    text: str
+    case_sensitive: bool = False
+    whole_word: bool = False
+    regex: bool = False
+
+    def terms(self) -> list[str]:
+        """Return the literal terms, whitespace normalized like the indexed text"""
+        return [" ".join(term.split()) for term in self.text.split("|") if term.strip()]
+
+    def isPlain(self) -> bool:
+        return not (self.regex or self.case_sensitive or self.whole_word) and len(self.terms()) == 1
+
+    def pattern(self) -> re.Pattern:
+        """Compile the query, raise re.error if the regular expression is invalid"""
+        if self.regex:
+            expression = self.text
+        else:
+            expression = "|".join(re.escape(term) for term in sorted(self.terms(), key=len, reverse=True))
+        if self.whole_word:
+            expression = rf"(?<!\w)(?:{expression})(?!\w)"
+        return re.compile(expression, 0 if self.case_sensitive else re.IGNORECASE)
+
+    def narrows(self, previous: "SearchQuery") -> bool:
+        """Whether the pages matching this query all match previous: a literal term containing the previous one"""
+        if self.regex or self.whole_word or (previous.regex, previous.whole_word, previous.case_sensitive) != (False, False, self.case_sensitive):
+            return False
+        terms, previous_terms = self.terms(), previous.terms()
+        if len(terms) != 1 or len(previous_terms) != 1:
+            return False
+        if self.case_sensitive:
+            return previous_terms[0] in terms[0]
+        return fold(previous_terms[0]) in fold(terms[0])
+
+
+class BoxGrid:
+    """Spatial index of boxes (words, link hotspots...): a grid of square cells listing the boxes they intersect"""
+    def __init__(self, boxes: array, cell_size: float = 32.0):
+        self.boxes = boxes
+        self.cell_size = cell_size
+        self.cells: dict[tuple[int, int], list[int]] = {}
+        for i in range(len(boxes) // 4):
+            x0, y0, x1, y1 = boxes[4 * i:4 * i + 4]
+            for cell in self.cellsIn(x0, y0, x1, y1):
+                self.cells.setdefault(cell, []).append(i)
+
+    def cellsIn(self, x0: float, y0: float, x1: float, y1: float):
+        size = self.cell_size
+        for column in range(int(x0 // size), int(x1 // size) + 1):
+            for row in range(int(y0 // size), int(y1 // size) + 1):
+                yield column, row
+
+    def query(self, rect: pymupdf.Rect) -> list[int]:
+        """Return the boxes intersecting rect, in index order"""
+        found = set()
+        for cell in self.cellsIn(rect.x0, rect.y0, rect.x1, rect.y1):
+            for i in self.cells.get(cell, ()):
+                if i in found:
+                    continue
+                x0, y0, x1, y1 = self.boxes[4 * i:4 * i + 4]
+                if x0 < rect.x1 and rect.x0 < x1 and y0 < rect.y1 and rect.y0 < y1:
+                    found.add(i)
+        return sorted(found)
+
+
+class PageWords:
+    """
+        Words of a page and their boxes, as extracted once by page.get_text("words")
+
+        Words are joined by single spaces in text; hits found in text are turned into quads from the word boxes.
+    """
+    __slots__ = ("words", "boxes", "text", "folded", "starts", "_grid")
+
+    def __init__(self, words: list[str], boxes: array):
+        self.words = words
+        self.boxes = boxes  # x0, y0, x1, y1 of each word
+        self.text = " ".join(words)
+        self.folded = fold(self.text)
+        self._grid: BoxGrid | None = None
+        self.starts: list[int] = []  # offset of each word in text
+        offset = 0
+        for word in words:
+            self.starts.append(offset)
+            offset += len(word) + 1
+
+    @classmethod
+    def fromPage(cls, page: pymupdf.Page) -> "PageWords":
+        words = []
+        boxes = array("f")
+        for x0, y0, x1, y1, word, *_ in page.get_text("words", sort=True):
+            words.append(word)
+            boxes.extend((x0, y0, x1, y1))
+        return cls(words, boxes)
+
+    def grid(self) -> BoxGrid:
+        """Return the spatial index of the words, built on first use"""
+        if self._grid is None:
+            self._grid = BoxGrid(self.boxes)
+        return self._grid
+
+    def textIn(self, rect: pymupdf.Rect) -> str:
+        """Return the words mostly inside rect, like page.get_textbox at word level"""
+        words = []
+        for i in self.grid().query(rect):
+            x0, y0, x1, y1 = self.boxes[4 * i:4 * i + 4]
+            box = pymupdf.Rect(x0, y0, x1, y1)
+            if (box & rect).get_area() * 2 >= box.get_area():
+                words.append(self.words[i])
+        return " ".join(words)
+
+    def size(self) -> int:
+        """Approximate memory held in bytes"""
+        return 2 * len(self.text) + 4 * len(self.boxes) + 64 * len(self.words)
+
+    def match(self, pattern: re.Pattern) -> list[pymupdf.Quad]:
+        """Return the quads of the matches of pattern in text"""
+        quads = []
+        for match in pattern.finditer(self.text):
+            if match.end() > match.start():
+                quads.extend(self.spanQuads(match.start(), match.end()))
+        return quads
+
+    def snippet(self, rect: pymupdf.Rect, context: int = 5) -> str:
+        """Return the words intersecting rect with context words around"""
+        hits = [i for i in range(len(self.words))
+                if self.boxes[4 * i] < rect.x1 and rect.x0 < self.boxes[4 * i + 2]
+                and self.boxes[4 * i + 1] < rect.y1 and rect.y0 < self.boxes[4 * i + 3]]
+        if not hits:
+            return ""
+        return " ".join(self.words[max(hits[0] - context, 0):hits[-1] + context + 1])
+
+    def find(self, text: str) -> list[pymupdf.Quad]:
+        """Return the quads of text, case-insensitive like page.search_for"""
+        needle = fold(" ".join(text.split()))
+        quads = []
+        if not needle:
+            return quads
+
+        start = self.folded.find(needle)
+        while start != -1:
+            quads.extend(self.spanQuads(start, start + len(needle)))
+            start = self.folded.find(needle, start + len(needle))
+        return quads
+
+    def spanQuads(self, start: int, end: int) -> list[pymupdf.Quad]:
+        """Return the quads covering text[start:end], one per line"""
+        rects: list[pymupdf.Rect] = []
+        first = bisect.bisect_right(self.starts, start) - 1
+        last = bisect.bisect_right(self.starts, end - 1) - 1
+
+        for i in range(max(first, 0), last + 1):
+            word_start = self.starts[i]
+            length = len(self.words[i])
+            a = max(start - word_start, 0)
+            b = min(end - word_start, length)
+            if b <= a:
+                continue
+
+            x0, y0, x1, y1 = self.boxes[4 * i:4 * i + 4]
+            width = x1 - x0
+            rect = pymupdf.Rect(x0 + width * a / length, y0, x0 + width * b / length, y1)
+
+            previous = rects[-1] if rects else None
+            if previous is not None and abs(previous.y0 - rect.y0) < 1 and 0 <= rect.x0 - previous.x1 < rect.height:
+                rects[-1] = previous | rect  # same line
+            else:
+                rects.append(rect)
+
+        return [rect.quad for rect in rects]
+
+
+class SearchIndex:
+    """
+        Full-text index of a document kept in its sidecar
+
+        Each page is stored once with its label, words and word boxes.
+        An FTS5 trigram table finds the pages holding a text (substring, case-insensitive) without reading them all.
+    """
+    def __init__(self, sidecar: Sidecar):
+        self.sidecar = sidecar
+
+        connection = self.sidecar.connection()
+        with connection:
+            connection.execute("CREATE TABLE IF NOT EXISTS pages(pno INTEGER PRIMARY KEY, label TEXT, words TEXT, boxes BLOB)")
+            try:
+                connection.execute("CREATE VIRTUAL TABLE IF NOT EXISTS page_text USING "
+                                   "fts5(words, content='pages', content_rowid='pno', tokenize='trigram')")
+                self.fts = True
+            except sqlite3.OperationalError:
+                logger.warning("SQLite has no FTS5 trigram tokenizer: indexed pages are scanned")
+                self.fts = False
+
+    def indexedPages(self) -> set[int]:
+        return {pno for (pno,) in self.sidecar.connection().execute("SELECT pno FROM pages")}
+
+    def addPages(self, pages: list[tuple[int, str, PageWords]]):
+        """Store pages (pno, label, words)"""
+        connection = self.sidecar.connection()
+        with connection:
+            for pno, label, words in pages:
+                cursor = connection.execute("INSERT OR IGNORE INTO pages(pno, label, words, boxes) VALUES (?, ?, ?, ?)",
+                                            (pno, label, words.text, words.boxes.tobytes()))
+                if self.fts and cursor.rowcount == 1:  # not stored meanwhile by another thread
+                    connection.execute("INSERT INTO page_text(rowid, words) VALUES (?, ?)", (pno, words.text))
+
+    def candidatePages(self, query: SearchQuery) -> set[int] | None:
+        """Return the indexed pages that may match query, None if the index cannot tell (all indexed pages)"""
+        terms = query.terms()
+        if not self.fts or query.regex or not terms or min(len(term) for term in terms) < 3:  # trigrams
+            return None
+        # trigrams are case-insensitive: a superset of the pages for case-sensitive and whole word terms
+        phrases = " OR ".join('"' + term.replace('"', '""') + '"' for term in terms)
+        rows = self.sidecar.connection().execute("SELECT rowid FROM page_text WHERE page_text MATCH ?", (phrases,))
+        return {pno for (pno,) in rows}
+
+    def page(self, pno: int) -> tuple[str, PageWords] | None:
+        """Return the label and words of page pno"""
+        row = self.sidecar.connection().execute("SELECT label, words, boxes FROM pages WHERE pno = ?", (pno,)).fetchone()
+        if row is None:
+            return None
+        label, text, blob = row
+        boxes = array("f")
+        boxes.frombytes(blob)
+        return label, PageWords(text.split(" ") if text else [], boxes)
+
+    def close(self):
+        self.sidecar.close()
+
+
+def pageWords(document: pymupdf.Document, pno: int, index: SearchIndex | None = None,
+              words_cache: LRUCache | None = None) -> tuple[str, PageWords]:
+    """
+        Return the label and words of page pno, from words_cache, the index or the page (then stored in both)
+        Entries are keyed by document too: a worker still running on a previous document does not mix its pages in.
+    """
+    key = (document, pno)
+    entry = words_cache.get(key) if words_cache is not None else None
+    if entry is not None:
+        return entry
+
+    entry = index.page(pno) if index is not None else None
+    if entry is None:
+        with fitz_lock:
+            page: pymupdf.Page = document.load_page(pno)
+            entry = (page.get_label(), PageWords.fromPage(page))
+        if index is not None:
+            index.addPages([(pno, *entry)])
+
+    if words_cache is not None:
+        words_cache.insert(key, entry, entry[1].size())
+    return entry
+
+
+def openIndex(filename: str) -> SearchIndex | None:
+    """Return the search index of the document filename, None if it cannot be stored"""
+    if not filename:
+        return None
+    try:
+        return SearchIndex(Sidecar(filename))
+    except (OSError, sqlite3.Error) as e:
+        logger.warning(f"No search index for {filename}: {e}")
+        return None
+
+
+_search_documents: dict[str, pymupdf.Document] = {}  # document opened by a search process
+
+
+def processSearch(filename: str, query: SearchQuery, start: int, stop: int) -> list[tuple[int, str, list[pymupdf.Quad]]]:
+    """
+        Process pool worker: search pages start to stop - 1 of filename
+        Return the hits (pno, label, quads) of the pages matching query
+    """
+    doc = _search_documents.get(filename)
+    if doc is None:
+        for other in _search_documents.values():
+            other.close()
+        _search_documents.clear()
+        doc = _search_documents[filename] = pymupdf.Document(filename)
+
+    pattern = None if query.isPlain() else query.pattern()
+    hits = []
+    for pno in range(start, stop):
+        page: pymupdf.Page = doc.load_page(pno)
+        if pattern is None:
+            quads = page.search_for(query.text, quads=True)
+        else:
+            quads = PageWords.fromPage(page).match(pattern)
+        if quads:
+            hits.append((pno, page.get_label(), quads))
+    return hits
+
+
+def pageRanges(pnos: list[int], size: int) -> list[range]:
+    """Split sorted page numbers in ranges of consecutive pages, at most size long"""
+    ranges = []
+    for pno in pnos:
+        if ranges and ranges[-1].stop == pno and len(ranges[-1]) < size:
+            ranges[-1] = range(ranges[-1].start, pno + 1)
+        else:
+            ranges.append(range(pno, pno + 1))
+    return ranges
+
+
+class SearchHits(Mapping):
+    """
+        Hits of a search in compact arrays: page number and quad coordinates of each hit, in page order
+        Also read as a mapping pno: quads, the quads of a page being built on access.
+    """
+    def __init__(self):
+        self.pnos = array("i")
+        self.coordinates = array("f")  # ul, ur, ll, lr (x, y) of each hit
+        self.labels: dict[int, str] = {}
+        self._pages: dict[int, range] = {}  # pno: hits
+
+    def addPage(self, pno: int, label: str, quads: list[pymupdf.Quad]):
+        self._pages[pno] = range(len(self.pnos), len(self.pnos) + len(quads))
+        self.labels[pno] = label
+        self.pnos.extend([pno] * len(quads))
+        for quad in quads:
+            self.coordinates.extend((quad.ul.x, quad.ul.y, quad.ur.x, quad.ur.y, quad.ll.x, quad.ll.y, quad.lr.x, quad.lr.y))
+
+    def clear(self):
+        self.pnos = array("i")
+        self.coordinates = array("f")
+        self.labels.clear()
+        self._pages.clear()
+
+    def count(self) -> int:
+        """Return the number of hits"""
+        return len(self.pnos)
+
+    def quad(self, hit: int) -> pymupdf.Quad:
+        c = self.coordinates[8 * hit:8 * hit + 8]
+        return pymupdf.Quad((c[0], c[1]), (c[2], c[3]), (c[4], c[5]), (c[6], c[7]))
+
+    def pageHits(self, pno: int) -> range:
+        return self._pages.get(pno, range(0))
+
+    def __getitem__(self, pno: int) -> list[pymupdf.Quad]:
+        return [self.quad(hit) for hit in self._pages[pno]]
+
+    def __iter__(self):
+        return iter(self._pages)
+
+    def __len__(self) -> int:
+        return len(self._pages)
+
+
+class SearchSignals(QtCore.QObject):
+    pageFound = Signal(int, int, str, list)  # ticket, pno, page label, quads
+    progress = Signal(int, int)  # ticket, pages searched
+    finished = Signal(int)  # ticket
+    failed = Signal(int, str)  # ticket, error message, before finished
+    executorBroken = Signal(object)  # executor whose processes died, not to be used anymore
+    snippetsFound = Signal(int, dict)  # ticket, {hit: text around}
+
+
+class SearchWorker(QtCore.QRunnable):
+    """
+        Search the document page by page off the GUI thread
+        Hits are emitted per page as they are found; the search stops as soon as it is cancelled.
+        Indexed pages are answered from the index, the others are scanned: by page.search_for for plain queries,
+        else by matching the page words, extracted once and kept in words_cache and the index.
+
+        Only the pages in pages are searched, if given.
+        With an executor, the pages to scan (at least process_min_pages) are split in ranges searched in parallel by
+        processes opening the document file. Their hits are merged back in page order as the ranges complete.
+        The ranges a process failed to search are scanned in the thread. A broken executor is reported by executorBroken.
+    """
+    def __init__(self, document: pymupdf.Document, query: SearchQuery, ticket: int, is_cancelled: Callable[[int], bool], signals: SearchSignals,
+                 index: SearchIndex | None = None, executor: Executor | None = None, process_min_pages: int = 0, range_size: int = 32,
+                 words_cache: LRUCache | None = None, pages: set[int] | None = None):
+        super().__init__()
+        self.document = document
+        self.query = query
+        self.pages = pages
+        self.pattern = None if query.isPlain() else query.pattern()
+        self.words_cache = words_cache
+        self.ticket = ticket
+        self.is_cancelled = is_cancelled
+        self.signals = signals
+        self.index = index
+        self.executor = executor
+        self.process_min_pages = process_min_pages
+        self.range_size = range_size
+
+    def submitRanges(self, indexed: set[int]) -> dict[int, tuple[range, Future]]:
+        """Submit the pages not indexed to the executor, return {first pno: (range, future)}"""
+        pnos = [pno for pno in range(self.document.page_count) if pno not in indexed and self.isSearched(pno)]
+        if self.executor is None or len(pnos) < max(self.process_min_pages, 1):
+            return {}
+        futures = {}
+        try:
+            for pages in pageRanges(pnos, self.range_size):
+                futures[pages.start] = (pages, self.executor.submit(processSearch, self.document.name, self.query,
+                                                                    pages.start, pages.stop))
+        except (BrokenProcessPool, RuntimeError) as e:  # RuntimeError: shut down
+            logger.error(f"Cannot search in processes, pages are scanned in the thread: {e}")
+            self.signals.executorBroken.emit(self.executor)
+            for _, future in futures.values():
+                future.cancel()
+            return {}
+        return futures
+
+    def isSearched(self, pno: int) -> bool:
+        return self.pages is None or pno in self.pages
+
+    def waitFor(self, future: Future) -> list | None:
+        """Return the result of future, None if cancelled meanwhile"""
+        while not self.is_cancelled(self.ticket):
+            try:
+                return future.result(timeout=0.05)
+            except TimeoutError:
+                continue
+        return None
+
+    def run(self):
+        # an exception escaping a QRunnable aborts the application
+        try:
+            self.search()
+        except Exception as e:
+            logger.exception(f"Search of {self.query.text!r} in {self.document.name} failed")
+            self.signals.failed.emit(self.ticket, f"Search failed: {e}")
+            self.signals.finished.emit(self.ticket)
+
+    def search(self):
+        indexed = set()
+        candidates = None
+        if self.index is not None:
+            indexed = self.index.indexedPages()
+            candidates = self.index.candidatePages(self.query)
+
+        futures = self.submitRanges(indexed)
+        try:
+            self.searchPages(indexed, candidates, futures)
+        finally:
+            for _, future in futures.values():
+                future.cancel()
+
+    def searchPages(self, indexed: set[int], candidates: set[int] | None, futures: dict[int, tuple[range, Future]]):
+        pno = 0
+        while pno < self.document.page_count:
+            if self.is_cancelled(self.ticket):
+                return
+
+            if pno in futures:
+                pages, future = futures.pop(pno)
+                try:
+                    hits = self.waitFor(future)
+                except Exception as e:
+                    logger.error(f"Cannot search pages {pages.start}-{pages.stop - 1} in a process: {e}")
+                    if isinstance(e, BrokenProcessPool):
+                        self.signals.executorBroken.emit(self.executor)
+                    continue  # scanned below
+                if hits is None:
+                    return
+                for hit in hits:
+                    self.signals.pageFound.emit(self.ticket, *hit)
+                pno = pages.stop
+                self.signals.progress.emit(self.ticket, pno)
+                continue
+
+            if not self.isSearched(pno) or (pno in indexed and candidates is not None and pno not in candidates):
+                pno += 1
+                continue
+
+            if pno in indexed or self.pattern is not None:
+                label, words = pageWords(self.document, pno, self.index, self.words_cache)
+                quads = words.find(self.query.text) if self.pattern is None else words.match(self.pattern)
+            else:
+                with fitz_lock:
+                    page: pymupdf.Page = self.document.load_page(pno)
+                    quads: list = page.search_for(self.query.text, quads=True)
+                    label = page.get_label() if quads else ""
+
+            if quads:
+                self.signals.pageFound.emit(self.ticket, pno, label, quads)
+            if pno % 16 == 15:
+                self.signals.progress.emit(self.ticket, pno + 1)
+            pno += 1
+
+        self.signals.finished.emit(self.ticket)
+
+
+def indexPages(document: pymupdf.Document, index: SearchIndex, is_cancelled: Callable[[], bool] = lambda: False, batch_size: int = 32):
+    """Store in index the words of the pages of document not indexed yet"""
+    indexed = index.indexedPages()
+    batch = []
+    for pno in range(document.page_count):
+        if is_cancelled():
+            break
+        if pno in indexed:
+            continue
+
+        with fitz_lock:
+            page: pymupdf.Page = document.load_page(pno)
+            batch.append((pno, page.get_label(), PageWords.fromPage(page)))
+
+        if len(batch) >= batch_size:
+            index.addPages(batch)
+            batch = []
+    index.addPages(batch)
+
+
+class SnippetWorker(QtCore.QRunnable):
+    """Extract the text around search hits from the words of their pages, off the GUI thread"""
+    def __init__(self, document: pymupdf.Document, hits: list[tuple[int, int, pymupdf.Rect]], ticket: int,
+                 is_cancelled: Callable[[int], bool], signals: SearchSignals, index: SearchIndex | None = None,
+                 words_cache: LRUCache | None = None):
+        super().__init__()
+        self.document = document
+        self.hits = hits  # (hit, pno, rect)
+        self.ticket = ticket
+        self.is_cancelled = is_cancelled
+        self.signals = signals
+        self.index = index
+        self.words_cache = words_cache
+
+    def run(self):
+        snippets = {}
+        for hit, pno, rect in self.hits:
+            if self.is_cancelled(self.ticket):
+                return
+            _, words = pageWords(self.document, pno, self.index, self.words_cache)
+            snippets[hit] = words.snippet(rect)
+        self.signals.snippetsFound.emit(self.ticket, snippets)
+
+
+class IndexWorker(QtCore.QRunnable):
+    """Extract the words of the pages not yet in the index, in background"""
+    def __init__(self, document: pymupdf.Document, index: SearchIndex, ticket: int, is_cancelled: Callable[[int], bool], batch_size: int = 32):
+        super().__init__()
+        self.document = document
+        self.index = index
+        self.ticket = ticket
+        self.is_cancelled = is_cancelled
+        self.batch_size = batch_size
+
+    def run(self):
+        try:
+            indexPages(self.document, self.index, lambda: self.is_cancelled(self.ticket), self.batch_size)
+        except sqlite3.Error as e:
+            logger.error(f"Cannot index {self.document.name}: {e}")
+        finally:
+            self.index.close()
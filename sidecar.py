@@ -0,0 +1,81 @@
+import os
+import hashlib
+import sqlite3
+import logging
+import threading
+
+from PyQt6 import QtCore
+
+SIDECAR_VERSION = 1
+
+logger = logging.getLogger(__name__)
+
+
+def sidecarDirectory() -> str:
+    location = QtCore.QStandardPaths.writableLocation(QtCore.QStandardPaths.StandardLocation.GenericCacheLocation)
+    return os.path.join(location, "PyMuPDF4QT")
+
+
+def fileStamp(filename: str) -> str:
+    """Identify the version of a file by its size and modification time"""
+    stat = os.stat(filename)
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+
+class Sidecar:
+    """
+        Data derived from a document (search index, links...) cached on disk in an SQLite database
+
+        The database is named after the document path and reset when the file size or modification time changes.
+        Each thread gets its own connection.
+    """
+    def __init__(self, filename: str, directory: str | None = None):
+        self.filename = os.path.abspath(filename)
+
+        directory = directory or sidecarDirectory()
+        os.makedirs(directory, exist_ok=True)
+        key = hashlib.sha1(os.path.normcase(self.filename).encode("utf-8")).hexdigest()
+        self.path = os.path.join(directory, f"{key}.sqlite")
+
+        self._local = threading.local()
+        self.validate()
+
+    def stamp(self) -> str:
+        return f"{SIDECAR_VERSION}:{fileStamp(self.filename)}"
+
+    def connection(self) -> sqlite3.Connection:
+        """Return the connection of the calling thread"""
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")  # readers do not wait for the indexer
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def validate(self):
+        """Drop everything if the sidecar was built from another version of the file"""
+        stamp = self.stamp()
+        connection = self.connection()
+        with connection:
+            connection.execute("CREATE TABLE IF NOT EXISTS meta(key TEXT PRIMARY KEY, value TEXT)")
+            row = connection.execute("SELECT value FROM meta WHERE key = 'stamp'").fetchone()
+            if row is not None and row[0] == stamp:
+                return
+
+            logger.info(f"Reset sidecar of {self.filename}")
+            # virtual tables first: dropping them drops their shadow tables
+            tables = connection.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name != 'meta' "
+                                        "ORDER BY sql NOT LIKE 'CREATE VIRTUAL TABLE%'").fetchall()
+            for (name,) in tables:
+                if connection.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (name,)).fetchone():
+                    connection.execute(f'DROP TABLE "{name}"')
+            connection.execute("DELETE FROM meta")
+            connection.execute("INSERT INTO meta(key, value) VALUES ('stamp', ?)", (stamp,))
+
+    def close(self):
+        """Close the connection of the calling thread"""
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
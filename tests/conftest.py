@@ -0,0 +1,46 @@
+import os
+import sys
+
+import pytest
+import pymupdf
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt6 import QtCore, QtWidgets
+
+
+@pytest.fixture(scope="session")
+def app():
+    QtCore.QStandardPaths.setTestModeEnabled(True)  # sidecars out of the user cache
+    application = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+    yield application
+
+
+@pytest.fixture
+def wait_until(app):
+    """Process events until predicate is true, return whether it became true within timeout ms"""
+    def waitUntil(predicate, timeout: int = 10000) -> bool:
+        timer = QtCore.QElapsedTimer()
+        timer.start()
+        while not predicate():
+            if timer.elapsed() > timeout:
+                return False
+            app.processEvents(QtCore.QEventLoop.ProcessEventsFlag.AllEvents, 50)
+        return True
+    return waitUntil
+
+
+@pytest.fixture
+def pdf_file(tmp_path):
+    """Write a 6 page document: "alpha" on every page, "omega" on pages 2 and 5 only"""
+    filename = str(tmp_path / "sample.pdf")
+    document = pymupdf.open()
+    for pno in range(6):
+        page = document.new_page()
+        page.insert_text((72, 72), f"alpha page {pno + 1}")
+        if pno in (1, 4):
+            page.insert_text((72, 144), "omega here")
+    document.save(filename)
+    document.close()
+    return filename
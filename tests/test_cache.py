@@ -0,0 +1,39 @@
+from cache import LRUCache
+
+
+def test_lru_byte_budget():
+    cache = LRUCache(max_bytes=100)
+    for key in range(4):
+        cache.insert(key, f"value {key}", 30)
+    assert cache.keys() == [1, 2, 3]
+    assert cache.current_bytes == 90
+    assert cache.evictions == 1
+
+    cache.get(1)  # refreshed: evicted after 2 and 3
+    cache.insert(4, "big", 60)
+    assert cache.keys() == [1, 4]
+    assert cache.current_bytes == 90
+
+    cache.insert(5, "too big", 500)  # kept alone even over the budget
+    assert cache.keys() == [5]
+    assert cache.current_bytes == 500
+
+    cache.pop(5)
+    assert cache.current_bytes == 0
+
+
+def test_lru_sizeof():
+    cache = LRUCache(max_bytes=10, sizeof=len)
+    cache.insert("a", b"12345678")
+    cache.insert("b", b"1234")
+    assert cache.keys() == ["b"]
+    assert cache.current_bytes == 4
+
+
+def test_lru_max_entries():
+    cache = LRUCache(max_entries=2)
+    for key in "abc":
+        cache.insert(key, key)
+    assert cache.keys() == ["b", "c"]
+    assert cache.get("a") is None
+    assert cache.stats()["misses"] == 1
@@ -0,0 +1,88 @@
+import csv
+import json
+
+import pymupdf
+
+from cache import LRUCache
+from keywords import KeywordMatcher, KeywordResults
+from search import pageWords
+
+
+def test_matcher_reports_overlapping_terms():
+    matcher = KeywordMatcher(["he", "she", "hers", "his"])
+    assert sorted(matcher.finditer("ushers")) == [(0, 2, 4), (1, 1, 4), (2, 2, 6)]
+
+
+def test_matcher_whole_word_and_case():
+    matcher = KeywordMatcher(["cat", "Big  Cat"], whole_word=True)
+    assert sorted(matcher.finditer("a big cat, concatenate CAT")) == [(0, 6, 9), (0, 23, 26), (1, 2, 9)]
+
+    matcher = KeywordMatcher(["Cat"], case_sensitive=True)
+    assert [start for _, start, _ in matcher.finditer("cat Cat CAT")] == [4]
+
+
+def results():
+    results = KeywordResults(["alpha", "never"])
+    results.addPage(0, "i", {0: [pymupdf.Rect(1, 2, 3, 4).quad]})
+    results.addPage(3, "iv", {0: [pymupdf.Rect(0, 0, 1, 1).quad] * 2})
+    return results
+
+
+def test_results_export_csv(tmp_path):
+    filename = str(tmp_path / "hits.csv")
+    results().exportCsv(filename)
+    with open(filename, newline="", encoding="utf-8") as f:
+        rows = list(csv.reader(f))
+    assert rows == [["term", "total", "index", "label", "hits"],
+                    ["alpha", "3", "0", "i", "1"],
+                    ["alpha", "3", "3", "iv", "2"],
+                    ["never", "0", "", "", "0"]]
+
+
+def test_results_export_json(tmp_path):
+    filename = str(tmp_path / "hits.json")
+    results().exportJson(filename, "sample.pdf")
+    with open(filename, encoding="utf-8") as f:
+        exported = json.load(f)
+    assert exported["document"] == "sample.pdf"
+    alpha, never = exported["terms"]
+    assert (alpha["term"], alpha["total"]) == ("alpha", 3)
+    assert [(page["index"], page["label"], page["hits"]) for page in alpha["pages"]] == [(0, "i", 1), (3, "iv", 2)]
+    assert alpha["pages"][0]["quads"] == [[1, 2, 3, 2, 1, 4, 3, 4]]
+    assert never == {"term": "never", "total": 0, "pages": []}
+
+
+def test_page_words_cache_is_keyed_by_document():
+    first, second = pymupdf.open(), pymupdf.open()
+    first.new_page().insert_text((72, 72), "apple")
+    second.new_page().insert_text((72, 72), "banana")
+
+    cache = LRUCache(max_bytes=1 << 20)
+    assert pageWords(first, 0, words_cache=cache)[1].text == "apple"
+    assert pageWords(second, 0, words_cache=cache)[1].text == "banana"
+    assert len(cache.keys()) == 2
+
+
+def test_keyword_model_set_document_drops_results(app, pdf_file, wait_until):
+    from QtPymuPdf import KeywordModel, SearchModel
+
+    search_model = SearchModel()
+    model = KeywordModel(search_model)
+    try:
+        document = pymupdf.open(pdf_file)
+        search_model.setDocument(document)
+        model.setDocument(document)
+        model.searchKeywords(["omega", "alpha", "nowhere"])
+        assert wait_until(lambda: not model.isSearching())
+        assert sorted(model.termHits(0)) == [1, 4]
+        assert len(model.termHits(1)) == 6
+        assert model.termHits(2) == {}
+        assert model.item(0).rowCount() == 2
+
+        model.setDocument(pymupdf.open())
+        assert model.rowCount() == 0
+        assert model.results().terms == []
+    finally:
+        model.cancelSearch()
+        search_model.shutdown()
+        search_model.cancelSearch()
@@ -0,0 +1,43 @@
+import os
+import signal
+
+import pymupdf
+
+from library import Library, libraryFiles
+
+
+def writePdf(filename: str, pages: int = 1):
+    document = pymupdf.open()
+    for pno in range(pages):
+        document.new_page().insert_text((72, 72), f"{os.path.basename(filename)} page {pno} " * 10)
+    document.save(filename)
+
+
+def test_library_files(tmp_path):
+    (tmp_path / "b").mkdir()
+    for name in ("b/two.pdf", "one.PDF", "notes.txt", "a.pdf"):
+        writePdf(str(tmp_path / name)) if name.lower().endswith(".pdf") else (tmp_path / name).write_text("")
+    assert libraryFiles(str(tmp_path)) == [str(tmp_path / name) for name in ("a.pdf", "one.PDF", "b/two.pdf")]
+
+
+def test_library_retries_files_of_a_dead_process(app, wait_until, tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))  # sidecars of the indexing processes
+    directory = tmp_path / "library"
+    directory.mkdir()
+    for n in range(6):
+        writePdf(str(directory / f"file{n}.pdf"), pages=200)
+
+    library = Library(max_workers=2)
+    try:
+        library.setDirectory(str(directory))
+        assert wait_until(lambda: library._executor is not None and len(library._executor._processes) == 2)
+        os.kill(next(iter(library._executor._processes)), signal.SIGKILL)
+
+        assert wait_until(lambda: not library.isIndexing(), timeout=120000)
+        assert library.failed == set()
+        assert len(library.indexedFiles()) == 6
+
+        library.rescan()  # the pool is usable again
+        assert not library.isIndexing()
+    finally:
+        library.shutdown()
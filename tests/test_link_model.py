@@ -0,0 +1,32 @@
+import pymupdf
+
+
+def linkedPdf(filename: str) -> str:
+    """Write a 4 page document: each page links to the next one through the text "next page N" """
+    document = pymupdf.open()
+    for pno in range(4):
+        document.new_page()
+    for pno in range(3):
+        page = document[pno]
+        page.insert_text((72, 72), f"next page {pno + 2}")
+        hotspot = page.search_for(f"next page {pno + 2}")[0]
+        page.insert_link({"kind": pymupdf.LINK_GOTO, "from": hotspot, "page": pno + 1, "to": pymupdf.Point(0, 0)})
+    document.save(filename)
+    return filename
+
+
+def test_link_model_labels_links_when_shown(app, tmp_path, wait_until):
+    from QtPymuPdf import LinkModel
+
+    model = LinkModel()
+    try:
+        model.setDocument(pymupdf.open(linkedPdf(str(tmp_path / "linked.pdf"))))
+        assert wait_until(lambda: model.rowCount() == 3 and model.linkGraph() is not None)
+        assert [model.linkGraph().linksFrom(pno) for pno in range(4)] == [[1], [2], [3], []]
+
+        assert model.data(model.index(1, 0)) == "…"  # read in background
+        assert wait_until(lambda: model.data(model.index(1, 0)) != "…")
+        assert model.data(model.index(1, 0)) == "next page 3"
+        assert model.item(0).link().label is None  # only the rows shown are read
+    finally:
+        model.setDocument(pymupdf.open())
@@ -0,0 +1,103 @@
+import pymupdf
+
+from links import LinkGraph, LinkStore, NamedDestinations
+from sidecar import Sidecar
+
+
+def pageLinks(pno):
+    return [{"kind": pymupdf.LINK_GOTO, "from": pymupdf.Rect(10, 10 + pno, 50, 20 + pno), "page": pno + 1,
+             "to": pymupdf.Point(5, 6)},
+            {"kind": pymupdf.LINK_URI, "from": pymupdf.Rect(0, 0, 1, 1), "uri": f"https://example.com/{pno}"}]
+
+
+def test_link_graph_from_links():
+    links = LinkStore()
+    for pno in range(3):
+        links.addPage(pno, pageLinks(pno))
+    links.addPage(3, [{"kind": pymupdf.LINK_GOTO, "from": pymupdf.Rect(0, 0, 1, 1), "page": 0},
+                      {"kind": pymupdf.LINK_GOTO, "from": pymupdf.Rect(0, 0, 1, 1), "page": 9}])  # out of the document
+
+    graph = LinkGraph()
+    graph.addLinks(links, page_count=4)
+    assert sorted(graph.edges()) == [(0, 1), (1, 2), (2, 3), (3, 0)]  # uri links go nowhere
+    assert graph.linksFrom(0) == [1]
+    assert graph.linksTo(0) == [3]
+    assert graph.linksFrom(9) == []
+
+
+def test_link_graph_sidecar(tmp_path, pdf_file):
+    sidecar = Sidecar(pdf_file, str(tmp_path / "sidecars"))
+    assert LinkGraph.load(sidecar) is None  # not built yet
+
+    LinkGraph([(0, 2), (0, 1), (0, 2), (3, 1)]).store(sidecar)
+    graph = LinkGraph.load(sidecar)
+    assert graph.linksFrom(0) == [1, 2]
+    assert graph.linksTo(1) == [0, 3]
+    sidecar.close()
+
+    LinkGraph().store(Sidecar(pdf_file, str(tmp_path / "sidecars")))  # a document without links is built too
+    assert list(LinkGraph.load(Sidecar(pdf_file, str(tmp_path / "sidecars"))).edges()) == []
+
+
+def test_link_store_extend_offsets():
+    store = LinkStore()
+    store.addPage(0, pageLinks(0))
+    store.labels[1] = "first uri"
+
+    later = LinkStore()
+    later.addPage(3, pageLinks(3))
+    later.addPage(4, [])
+    later.labels[0] = "later goto"
+    store.extend(later)
+
+    assert len(store) == 4
+    assert store.pageLinks(0) == range(0, 2)
+    assert store.pageLinks(3) == range(2, 4)
+    assert store.pageLinks(4) == range(0)
+    assert store.labels == {1: "first uri", 2: "later goto"}
+    assert store.pages_to[2] == 4
+    assert store.hotspot(2) == pymupdf.Rect(10, 13, 50, 23)
+    assert store.target(2) == pymupdf.Point(5, 6)
+    assert store.target(3) is None
+    assert store.name(3) == "https://example.com/3"
+    assert store.zooms[2] == 1.0
+
+
+def namedPdf(filename: str) -> str:
+    document = pymupdf.open()
+    for _ in range(3):
+        document.new_page(width=595, height=842)
+    xrefs = [document.page_xref(pno) for pno in range(3)]
+    document.xref_set_key(document.pdf_catalog(), "Dests",
+                          f"<</xyz [{xrefs[2]} 0 R /XYZ 72 720 2] /fith [{xrefs[2]} 0 R /FitH 500] "
+                          f"/bottom <</D [{xrefs[2]} 0 R /XYZ 0 0 0]>> /fit [{xrefs[1]} 0 R /Fit] "
+                          f"/fitv [{xrefs[1]} 0 R /FitV 30] /nulltop [{xrefs[1]} 0 R /XYZ 10 null 0]>>")
+    document.save(filename)
+    return filename
+
+
+def test_named_destinations_to_page_coordinates(tmp_path):
+    destinations = NamedDestinations.fromDocument(pymupdf.open(namedPdf(str(tmp_path / "named.pdf"))))
+    assert len(destinations) == 6
+    assert destinations.resolve("xyz") == (2, pymupdf.Point(72, 122), 2)
+    assert destinations.resolve("fith") == (2, pymupdf.Point(0, 342), 1.0)  # no zoom: unchanged
+    assert destinations.resolve("bottom") == (2, pymupdf.Point(0, 842), 1.0)  # a real top of 0 is the bottom of the page
+    for name in ("fit", "fitv", "nulltop"):  # no position: top of the page
+        assert destinations.resolve(name) == (1, None, 1.0)
+    assert destinations.resolve("missing") is None
+
+
+def test_named_destinations_sidecar(tmp_path):
+    filename = namedPdf(str(tmp_path / "named.pdf"))
+    sidecar = Sidecar(filename, str(tmp_path / "sidecars"))
+    assert NamedDestinations.load(sidecar) is None
+
+    NamedDestinations.fromDocument(pymupdf.open(filename)).store(sidecar)
+    destinations = NamedDestinations.load(sidecar)
+    assert destinations.resolve("xyz") == (2, pymupdf.Point(72, 122), 2)
+    assert destinations.resolve("fit") == (1, None, 1.0)
+
+    with sidecar.connection() as connection:  # stored by an older version
+        connection.execute("UPDATE meta SET value = '1' WHERE key = 'named_destinations'")
+    assert NamedDestinations.load(sidecar) is None
+    sidecar.close()
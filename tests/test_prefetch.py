@@ -0,0 +1,24 @@
+from QtPymuPdf import Prefetcher
+
+
+def test_prefetch_around_page():
+    prefetcher = Prefetcher()
+    assert prefetcher.pages(5, 10) == [6, 4, 7]  # next page first, then the previous one
+    assert prefetcher.pages(0, 10) == [1, 2]
+    assert prefetcher.pages(9, 10) == [8]
+
+
+def test_prefetch_follows_direction_and_speed():
+    prefetcher = Prefetcher()
+    prefetcher.track(5)
+    prefetcher.track(4)
+    assert prefetcher.direction == -1
+    assert prefetcher.pages(4, 10) == [3, 5, 2, 1, 0]  # flipping fast: more pages ahead
+
+    prefetcher.reset()
+    assert prefetcher.direction == 1
+
+
+def test_prefetch_byte_budget():
+    prefetcher = Prefetcher(max_bytes=100)
+    assert prefetcher.pages(5, 10, cost=lambda pno: 40) == [6, 4]
@@ -0,0 +1,14 @@
+import pymupdf
+from PyQt6 import QtCore
+
+from render import tileClip, tilesIn
+
+
+def test_tiles_in_rect():
+    assert tilesIn(QtCore.QRectF(100, 100, 300, 50), 256) == {(0, 0), (1, 0)}
+    assert tilesIn(QtCore.QRectF(300, 600, 10, 10), 256) == {(1, 2)}
+    assert tilesIn(QtCore.QRectF(), 256) == set()
+
+
+def test_tile_clip_unzoomed():
+    assert tileClip((1, 2), 256, 2.0) == pymupdf.Rect(128, 256, 256, 384)
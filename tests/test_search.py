@@ -0,0 +1,162 @@
+import re
+import threading
+
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import pymupdf
+import pytest
+from PyQt6 import QtCore
+
+from search import BoxGrid, PageWords, SearchIndex, SearchQuery, SearchSignals, SearchWorker, indexPages, pageRanges, processSearch
+from sidecar import Sidecar
+
+
+def runSearch(document, query, timeout=10, **kwargs):
+    """Run a SearchWorker in a thread, return (finished, {pno: quads}, signals emitted)"""
+    signals = SearchSignals()
+    found = {}
+    emitted = []
+    direct = QtCore.Qt.ConnectionType.DirectConnection
+    signals.pageFound.connect(lambda ticket, pno, label, quads: found.__setitem__(pno, quads), direct)
+    signals.finished.connect(lambda ticket: emitted.append("finished"), direct)
+    signals.failed.connect(lambda ticket, error: emitted.append(error), direct)
+    signals.executorBroken.connect(lambda executor: emitted.append(executor), direct)
+    tickets = [0]
+    worker = SearchWorker(document, query, 0, lambda ticket: ticket != tickets[0], signals, **kwargs)
+    thread = threading.Thread(target=worker.run)
+    thread.start()
+    thread.join(timeout)
+    tickets[0] += 1  # stop a worker that did not finish
+    thread.join()
+    return "finished" in emitted, found, emitted
+
+
+def test_search_scans_every_page(pdf_file):
+    document = pymupdf.open(pdf_file)
+    finished, found, _ = runSearch(document, SearchQuery("omega"))
+    assert finished
+    assert sorted(found) == [1, 4]
+    assert len(found[1]) == 1
+
+
+def test_search_restricted_to_pages(pdf_file):
+    document = pymupdf.open(pdf_file)
+    finished, found, _ = runSearch(document, SearchQuery("alpha"), pages={0, 3})
+    assert finished
+    assert sorted(found) == [0, 3]
+
+
+def test_index_stores_page_words(pdf_file, tmp_path):
+    document = pymupdf.open(pdf_file)
+    index = SearchIndex(Sidecar(pdf_file, str(tmp_path / "sidecars")))
+    indexPages(document, index)
+    assert index.indexedPages() == set(range(document.page_count))
+
+    label, words = index.page(1)
+    assert words.text == PageWords.fromPage(document[1]).text
+    assert index.candidatePages(SearchQuery("omega")) == {1, 4}
+    assert index.candidatePages(SearchQuery("om")) is None  # shorter than a trigram
+
+
+def test_search_skips_indexed_pages_without_candidates(pdf_file, tmp_path):
+    document = pymupdf.open(pdf_file)
+    index = SearchIndex(Sidecar(pdf_file, str(tmp_path / "sidecars")))
+    indexPages(document, index)
+
+    finished, found, _ = runSearch(document, SearchQuery("omega"), index=index)
+    assert finished  # the pages that cannot match are skipped, not searched forever
+    assert sorted(found) == [1, 4]
+
+    finished, found, _ = runSearch(document, SearchQuery("nowhere"), index=index)
+    assert finished
+    assert found == {}
+
+
+def test_page_ranges():
+    assert pageRanges([0, 1, 2, 5, 6, 9], 2) == [range(0, 2), range(2, 3), range(5, 7), range(9, 10)]
+    assert pageRanges([], 32) == []
+
+
+def test_process_search(pdf_file):
+    hits = processSearch(pdf_file, SearchQuery("omega"), 0, 6)
+    assert [(pno, label) for pno, label, _ in hits] == [(1, ""), (4, "")]
+    hits = processSearch(pdf_file, SearchQuery("ALPHA PAGE 3", case_sensitive=True), 0, 6)
+    assert hits == []
+    hits = processSearch(pdf_file, SearchQuery("page [35]", regex=True), 2, 6)
+    assert [pno for pno, _, _ in hits] == [2, 4]
+
+
+def test_search_without_processes_falls_back_to_thread(pdf_file):
+    executor = ProcessPoolExecutor(1, mp_context=get_context("spawn"))
+    executor.shutdown()  # submit raises, like a broken pool
+    document = pymupdf.open(pdf_file)
+    finished, found, emitted = runSearch(document, SearchQuery("omega"), executor=executor, process_min_pages=1)
+    assert finished
+    assert sorted(found) == [1, 4]
+    assert executor in emitted
+
+
+def test_search_failure_is_reported():
+    document = pymupdf.open()
+    document.new_page()
+    document.close()
+    finished, found, emitted = runSearch(document, SearchQuery("omega"))
+    assert finished
+    assert emitted[0].startswith("Search failed")
+
+
+def test_query_pattern():
+    assert SearchQuery("alpha").isPlain()
+    assert not SearchQuery("alpha|omega").isPlain()
+
+    pattern = SearchQuery("alpha|al", whole_word=True).pattern()
+    assert [m.group() for m in pattern.finditer("alpha al alphabet AL")] == ["alpha", "al", "AL"]
+
+    pattern = SearchQuery("Alpha", case_sensitive=True).pattern()
+    assert [m.group() for m in pattern.finditer("alpha Alpha")] == ["Alpha"]
+
+    pattern = SearchQuery(r"page \d+", regex=True).pattern()
+    assert pattern.findall("Page 12, page x") == ["Page 12"]
+
+    with pytest.raises(re.error):
+        SearchQuery("(", regex=True).pattern()
+
+
+def test_page_words_match_and_find():
+    words = PageWords(["alpha", "beta", "alphabet"], array("f", (0, 0, 50, 10, 54, 0, 100, 10, 0, 20, 80, 30)))
+    assert words.text == "alpha beta alphabet"
+    assert len(words.find("ALPHA")) == 2
+    assert len(words.find("alpha beta")) == 1  # one quad: same line
+    assert words.find("alpha beta")[0].rect == pymupdf.Rect(0, 0, 100, 10)
+    assert len(words.match(SearchQuery("alpha", whole_word=True).pattern())) == 1
+
+
+def test_query_narrows():
+    previous = SearchQuery("alph")
+    assert SearchQuery("alpha").narrows(previous)
+    assert SearchQuery("ALPHA").narrows(previous)  # case-insensitive both
+    assert not SearchQuery("alp").narrows(previous)
+    assert not SearchQuery("alpha", case_sensitive=True).narrows(previous)
+    assert not SearchQuery("alpha", whole_word=True).narrows(previous)
+    assert not SearchQuery("alpha|beta").narrows(previous)
+    assert not SearchQuery("alpha").narrows(SearchQuery("al.", regex=True))
+    assert SearchQuery("Alpha", case_sensitive=True).narrows(SearchQuery("Alp", case_sensitive=True))
+    assert not SearchQuery("alpha", case_sensitive=True).narrows(SearchQuery("Alp", case_sensitive=True))
+
+
+def test_box_grid_query():
+    boxes = array("f", (0, 0, 10, 10, 100, 100, 110, 110, 5, 5, 200, 8))
+    grid = BoxGrid(boxes, cell_size=32)
+    assert grid.query(pymupdf.Rect(0, 0, 20, 20)) == [0, 2]
+    assert grid.query(pymupdf.Rect(150, 0, 160, 50)) == [2]
+    assert grid.query(pymupdf.Rect(105, 105, 106, 106)) == [1]
+    assert grid.query(pymupdf.Rect(10, 10, 100, 100)) == []  # touching edges do not intersect
+
+
+def test_page_words_text_in():
+    words = PageWords(["click", "here", "now", "below"], array("f", (0, 0, 40, 10, 44, 0, 80, 10, 84, 0, 120, 10, 0, 20, 40, 30)))
+    assert words.textIn(pymupdf.Rect(0, 0, 100, 12)) == "click here"  # "now" is mostly outside
+    assert words.textIn(pymupdf.Rect(0, 0, 120, 30)) == "click here now below"
+    assert words.textIn(pymupdf.Rect(200, 200, 300, 300)) == ""
@@ -0,0 +1,30 @@
+import pymupdf
+from PyQt6 import QtWidgets
+
+
+def test_search_model_with_view(app, pdf_file, wait_until):
+    from QtPymuPdf import SearchModel
+
+    model = SearchModel()
+    view = QtWidgets.QListView()
+    view.setModel(model)
+    view.show()
+    try:
+        model.setDocument(pymupdf.open(pdf_file))
+        changed = []
+        model.sigHitsChanged.connect(changed.extend)
+        model.searchFor("alpha")
+        assert wait_until(lambda: model.foundCount() == 6 and not model._searching)
+        assert model.rowCount() == 6
+        assert sorted(set(changed)) == list(range(6))
+        assert model.index(5).isValid()  # the view's QAbstractItemModel.index is not overridden
+
+        assert wait_until(lambda: "alpha" in model.data(model.index(0)))
+        assert model.data(model.index(0)).startswith("p. 1\t")
+
+        model.searchFor("omega")
+        assert wait_until(lambda: model.foundCount() == 2 and not model._searching)
+        assert [model.hit(row)[0] for row in range(model.rowCount())] == [1, 4]
+    finally:
+        model.shutdown()
+        model.cancelSearch()
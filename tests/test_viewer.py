@@ -0,0 +1,35 @@
+import pymupdf
+from PyQt6 import QtGui, QtWidgets
+
+from links import LinkStore
+
+
+def uriLinks(*uris):
+    from QtPymuPdf import UriLink
+
+    store = LinkStore()
+    store.addPage(0, [{"kind": pymupdf.LINK_URI, "from": pymupdf.Rect(0, 0, 1, 1), "uri": uri} for uri in uris])
+    return [UriLink(store, i) for i in range(len(uris))]
+
+
+def test_follow_link_opens_confirmed_web_and_mail_links_only(app, monkeypatch):
+    from pymupdfviewer import PdfView
+
+    opened, shown = [], []
+    answer = [QtWidgets.QMessageBox.StandardButton.Yes]
+    monkeypatch.setattr(QtGui.QDesktopServices, "openUrl", lambda url: opened.append(url.toString()))
+    monkeypatch.setattr(QtWidgets.QMessageBox, "question", lambda parent, title, text: shown.append(text) or answer[0])
+    monkeypatch.setattr(QtWidgets.QMessageBox, "warning", lambda parent, title, text: shown.append(text))
+
+    view = PdfView()
+    for link in uriLinks("https://example.com/a", "ms-msdt:/id PCWDiagnostic", "MAILTO:someone@example.com",
+                         "file:///etc/passwd"):
+        view.followLink(link)
+    assert opened == ["https://example.com/a", "mailto:someone@example.com"]
+    assert len(shown) == 4  # every target is shown
+    assert "ms-msdt:/id PCWDiagnostic" in shown[1]
+
+    answer[0] = QtWidgets.QMessageBox.StandardButton.No
+    view.followLink(uriLinks("http://example.com/b")[0])
+    assert "http://example.com/b" in shown[-1]
+    assert len(opened) == 2
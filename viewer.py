@@ -3,6 +3,8 @@ import fitz
 from PyQt6.QtCore import Qt
 from PyQt6 import QtGui, QtWidgets
 
+from render import toQImage
+
 class PdfViewer(QtWidgets.QGraphicsView):
     def __init__(self):
         super().__init__()
@@ -45,9 +47,7 @@ class PdfViewer(QtWidgets.QGraphicsView):
         mat = mat_0 * fitz.Matrix(zoom_factor, zoom_factor)  # zoom matrix
         
         pix = page_display.get_pixmap(alpha=False, matrix=mat)
-        pix_bytes = pix.tobytes()
-        pixmap = QtGui.QPixmap()
-        pixmap.loadFromData(pix_bytes)
+        pixmap = QtGui.QPixmap.fromImage(toQImage(pix))
         self.setPixmap(pixmap)
 
     @property